@@ -0,0 +1,24 @@
+# Omni-wheel robot simulation. Importing the package loads only the NumPy
+# core; pygame is imported by the front end once a window is opened or a
+# robot is drawn, so headless runs, sweeps and worker processes never load SDL.
+
+from .commands import CommandSource, ConstantCommands, GeneratorCommands, KeyboardCommands, TimelineCommands
+from .estimation import FleetEKF
+from .fleet import RobotFleet
+from .motors import WheelMotors
+from .obstacles import ObstacleMap
+from .odometry import OdometryModel, dead_reckon
+from .planning import DStarLite, GridPlanner
+from .presets import KEYMAPS, PRESETS, get_preset
+from .recorder import TrajectoryLog, TrajectoryRecorder
+from .robot import Robot
+from .sensors import RangeSensor
+from .simulation import Simulation
+from .tracking import PathSet, PathTracker, TrackingCommands
+
+
+def run_preset(name, **overrides):
+    # Open a window and drive the robot configured like one of the original scripts
+    sim = Simulation.from_preset(name, **overrides)
+    sim.run()
+    return sim
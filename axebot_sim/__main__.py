@@ -0,0 +1,33 @@
+import argparse
+
+from . import PRESETS, Simulation, run_preset
+from .sensors import RangeSensor
+
+# python -m axebot_sim [preset]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the omni-wheel robot simulation")
+    parser.add_argument("preset", nargs="?", default="v8", choices=list(PRESETS), help="script version to emulate")
+    parser.add_argument("--dirty-rects", action="store_true", help="redraw only the areas that changed")
+    parser.add_argument("--event-driven", action="store_true", help="sleep while the robot is idle")
+    parser.add_argument("--profile", metavar="PATH", help="profile frames and write them to PATH (.csv or .json)")
+    parser.add_argument("--obstacles", metavar="PATH", help="obstacle map: polygon .json, occupancy .npy or an image")
+    parser.add_argument("--lidar", metavar="RAYS", type=int, help="mount a lidar with RAYS rays (F4 toggles them)")
+    parser.add_argument("--goal", metavar=("X", "Y"), type=float, nargs=2,
+                        help="drive to (X, Y) on a planned path instead of by keyboard")
+    args = parser.parse_args(argv)
+    sensor = RangeSensor.lidar(args.lidar) if args.lidar else None
+    options = dict(dirty_rects=args.dirty_rects, event_driven=args.event_driven, profile=args.profile is not None,
+                   profile_path=args.profile, obstacles=args.obstacles, sensor=sensor)
+    if args.goal is None:
+        run_preset(args.preset, **options)
+        return
+    sim = Simulation.from_preset(args.preset, **options)
+    if sim.navigate(args.goal) is None:
+        parser.exit(1, f"goal {tuple(args.goal)} can't be reached\n")
+    sim.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import numpy as np
+
+from .presets import DEFAULT_KEYMAP
+
+# Command sources feed the simulation one robot-relative (forward, sideways,
+# omega) command per physics step. Simulation only talks to this interface, so
+# live keyboard driving, precompiled timelines and scripted generators are
+# interchangeable, and everything except the keyboard replays identically.
+
+
+class CommandSource:
+    # Number of steps the source can produce, or None if unbounded
+    steps = None
+    # Live sources change only in response to input events, so an idle
+    # simulation can sleep until the next event instead of polling
+    live = False
+    # Feedback sources compute each command from the robot's current pose, so
+    # their commands can't be fetched ahead of time as a block
+    feedback = False
+
+    def poll(self):
+        # Called once per rendered frame before that frame's physics steps
+        pass
+
+    def command(self, step):
+        raise NotImplementedError
+
+    def next_change(self, step):
+        # First step after `step` whose command may differ, or None if the
+        # command never changes (or, for live sources, only on input events).
+        # Unknown sources must assume every step can change.
+        return step + 1
+
+    def block(self, start, n):
+        # Commands for steps start .. start + n - 1 as an (n, 3) array. Sources
+        # that can do better than n command() calls override this.
+        return np.array([self.command(step) for step in range(start, start + n)], dtype=float).reshape(n, 3)
+
+
+class ConstantCommands(CommandSource):
+    def __init__(self, forward_speed=0.0, sideways_speed=0.0, desired_omega=0.0):
+        self.value = np.array([forward_speed, sideways_speed, desired_omega], dtype=float)
+
+    def command(self, step):
+        return tuple(self.value.tolist())
+
+    def next_change(self, step):
+        return None
+
+    def block(self, start, n):
+        return np.broadcast_to(self.value, (n, 3))
+
+
+class KeyboardCommands(CommandSource):
+    live = True
+
+    def __init__(self, base_speed=0.5, max_speed_ratio=6, keymap=DEFAULT_KEYMAP, turn_rate=0.5):
+        self.base_speed = base_speed
+        self.max_speed_ratio = max_speed_ratio
+        self.keymap = keymap  # See presets.KEYMAPS
+        self.turn_rate = turn_rate
+        self.current = (0, 0, 0)
+        self._bindings = None
+
+    def poll(self):
+        self.current = self.read()
+
+    def command(self, step):
+        return self.current
+
+    def next_change(self, step):
+        return None
+
+    def read(self):
+        # pygame is only imported once the keyboard is actually read, so
+        # headless simulations never load it
+        import pygame
+
+        if self._bindings is None:
+            self._bindings = self._resolve_keymap(pygame)
+        keys = pygame.key.get_pressed()
+        command = [0, 0, 0]
+        for axis, chain in self._bindings:
+            for key, speed in chain:
+                if keys[key]:
+                    command[axis] = speed
+                    break
+        return tuple(command)
+
+    def _resolve_keymap(self, pygame):
+        # Key names to pygame key codes and factors to speeds
+        bindings = []
+        for axis, chain in self.keymap:
+            scale = self.turn_rate if axis == 2 else self.base_speed
+            bindings.append((axis, [
+                (getattr(pygame, "K_" + name), scale * (self.max_speed_ratio if factor == "max" else factor))
+                for name, factor in chain
+            ]))
+        return bindings
+
+
+class TimelineCommands(CommandSource):
+    # Piecewise-constant timeline compiled once into a per-step (steps, 3)
+    # table, so looking up a step's command is a single array index.
+    # Past the end of the timeline the robot is commanded to stop.
+
+    def __init__(self, table):
+        self.table = np.ascontiguousarray(table, dtype=float).reshape(-1, 3)
+        self.steps = len(self.table)
+        # Steps where the command differs from the previous one, including the
+        # implicit stop after the end, so next_change() is a binary search
+        changes = np.flatnonzero(np.any(self.table[1:] != self.table[:-1], axis=1)) + 1
+        if self.steps and self.table[-1].any():
+            changes = np.append(changes, self.steps)
+        self._changes = changes
+
+    @classmethod
+    def compile(cls, times, commands, dt, duration=None):
+        # times[i] is when commands[i] starts (seconds, ascending from 0). The
+        # last command is held until duration, which defaults to one step.
+        times = np.asarray(times, dtype=float)
+        commands = np.asarray(commands, dtype=float).reshape(-1, 3)
+        if len(times) != len(commands):
+            raise ValueError("times and commands must have the same length")
+        if duration is None:
+            duration = times[-1] + dt if len(times) else 0.0
+        step_times = np.arange(round(duration / dt)) * dt
+        # Small tolerance so a segment starting at k * dt owns step k despite rounding
+        index = np.searchsorted(times, step_times + dt * 1e-9, side="right") - 1
+        table = np.where((index >= 0)[:, None], commands[np.maximum(index, 0)], 0.0)
+        return cls(table)
+
+    @classmethod
+    def load(cls, path, dt, duration=None):
+        # Segment rows of (t, forward, sideways, omega) from .npy or comma-separated text
+        if str(path).endswith(".npy"):
+            rows = np.load(path)
+        else:
+            rows = np.loadtxt(path, delimiter=",", comments="#", ndmin=2)
+        return cls.compile(rows[:, 0], rows[:, 1:4], dt, duration)
+
+    @classmethod
+    def load_table(cls, path):
+        # A per-step table written by save_table(), ready to index without recompiling
+        return cls(np.load(path))
+
+    def save_table(self, path):
+        np.save(path, self.table)
+
+    def command(self, step):
+        if step < self.steps:
+            return tuple(self.table[step].tolist())
+        return (0.0, 0.0, 0.0)
+
+    def next_change(self, step):
+        index = np.searchsorted(self._changes, step, side="right")
+        return int(self._changes[index]) if index < len(self._changes) else None
+
+    def block(self, start, n):
+        if start + n <= self.steps:
+            return self.table[start:start + n]
+        out = np.zeros((n, 3))
+        available = max(0, min(n, self.steps - start))
+        out[:available] = self.table[start:start + available]
+        return out
+
+
+class GeneratorCommands(CommandSource):
+    # Wraps any iterable of (forward, sideways, omega) commands, e.g. a Python
+    # generator. Commands are consumed in step order, and once the iterable is
+    # exhausted the robot is commanded to stop.
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.exhausted = False
+        self._last = (None, (0.0, 0.0, 0.0))  # (step, command) so repeated lookups don't consume
+
+    def command(self, step):
+        if step == self._last[0]:
+            return self._last[1]
+        command = (0.0, 0.0, 0.0)
+        if not self.exhausted:
+            try:
+                command = tuple(next(self.iterator))
+            except StopIteration:
+                self.exhausted = True
+        self._last = (step, command)
+        return command
+
+    def block(self, start, n):
+        out = np.zeros((n, 3))
+        for i in range(n):
+            if self.exhausted:
+                break
+            out[i] = self.command(start + i)
+        return out
@@ -0,0 +1,151 @@
+import numpy as np
+
+from .integrators import POSITION_SCALE
+
+# Extended Kalman filter over the (x, y, theta) pose of every robot of a
+# fleet at once: states are an (N, 3) array, covariances an (N, 3, 3) stack,
+# and every predict and update is a handful of batched NumPy operations with
+# no loop over robots.
+#
+# Prediction integrates odometry exactly as the simulation moves robots:
+# world-frame (vx, vy, omega) from the forward kinematics T @ q (see
+# dead_reckon in odometry.py), whose Jacobian is the identity, or body-frame
+# (forward, sideways, omega) velocities rotated by the estimated heading as
+# Simulation.to_world_velocity does, which makes the heading error leak into
+# position. Updates fuse absolute pose fixes, full or position only.
+
+
+def wrap_angle(angle):
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def velocity_covariance(T, encoder_noise, gyro_noise=None):
+    # Covariance of (vx, vy, omega) = T @ q for independent wheel speed noise
+    # of standard deviation encoder_noise; T is (3, 3) or (N, 3, 3). With
+    # gyro_noise, omega is taken from the gyro instead.
+    T = np.asarray(T, dtype=float)
+    covariance = (T * np.square(encoder_noise)) @ np.swapaxes(T, -1, -2)
+    if gyro_noise is not None:
+        covariance[..., 2, :] = 0.0
+        covariance[..., :, 2] = 0.0
+        covariance[..., 2, 2] = gyro_noise ** 2
+    return covariance
+
+
+def inverse_small(matrices):
+    # Batched inverse of (N, 2, 2) or (N, 3, 3) matrices from their cofactors:
+    # a few elementwise operations, where np.linalg pays a LAPACK call per matrix
+    m = matrices
+    inverse = np.empty_like(m)
+    if m.shape[-1] == 2:
+        determinant = m[:, 0, 0] * m[:, 1, 1] - m[:, 0, 1] * m[:, 1, 0]
+        inverse[:, 0, 0], inverse[:, 1, 1] = m[:, 1, 1], m[:, 0, 0]
+        inverse[:, 0, 1], inverse[:, 1, 0] = -m[:, 0, 1], -m[:, 1, 0]
+    else:
+        a, b, c = m[:, 0, 0], m[:, 0, 1], m[:, 0, 2]
+        d, e, f = m[:, 1, 0], m[:, 1, 1], m[:, 1, 2]
+        g, h, i = m[:, 2, 0], m[:, 2, 1], m[:, 2, 2]
+        inverse[:, 0, 0] = e * i - f * h
+        inverse[:, 0, 1] = c * h - b * i
+        inverse[:, 0, 2] = b * f - c * e
+        inverse[:, 1, 0] = f * g - d * i
+        inverse[:, 1, 1] = a * i - c * g
+        inverse[:, 1, 2] = c * d - a * f
+        inverse[:, 2, 0] = d * h - e * g
+        inverse[:, 2, 1] = b * g - a * h
+        inverse[:, 2, 2] = a * e - b * d
+        determinant = a * inverse[:, 0, 0] + b * inverse[:, 1, 0] + c * inverse[:, 2, 0]
+    inverse /= determinant[:, None, None]
+    return inverse
+
+
+class FleetEKF:
+    def __init__(self, poses, covariance=1.0):
+        # covariance: the initial (3, 3) or (N, 3, 3) covariance, or a scalar
+        # variance on every axis
+        self.state = np.array(poses, dtype=float).reshape(-1, 3)
+        n = len(self.state)
+        covariance = np.asarray(covariance, dtype=float)
+        if covariance.ndim == 0:
+            covariance = np.eye(3) * covariance
+        self.covariance = np.array(np.broadcast_to(covariance, (n, 3, 3)))
+        # Scratch for the body-frame prediction
+        self._jacobian = np.zeros((n, 3, 3))
+        self._jacobian[:] = np.eye(3)
+        self._input_jacobian = np.zeros((n, 3, 3))
+        self._product = np.empty((n, 3, 3))
+
+    def __len__(self):
+        return len(self.state)
+
+    def predict(self, velocities, dt, noise, body_frame=False):
+        # Propagate every robot by one step of dt. velocities is (N, 3), noise
+        # their (3, 3) or (N, 3, 3) covariance (see velocity_covariance).
+        velocities = np.asarray(velocities, dtype=float)
+        noise = np.asarray(noise, dtype=float)
+        scale = dt * POSITION_SCALE
+        state, covariance = self.state, self.covariance
+        if not body_frame:
+            state[:, :2] += velocities[:, :2] * scale
+            state[:, 2] += velocities[:, 2] * dt
+            covariance += noise * np.outer((scale, scale, dt), (scale, scale, dt))
+            return state
+
+        cos_theta, sin_theta = np.cos(state[:, 2]), np.sin(state[:, 2])
+        forward_speed, sideways_speed = velocities[:, 0], velocities[:, 1]
+        # d(vx, vy) / d(forward, sideways), from Simulation.to_world_velocity
+        G = self._input_jacobian
+        G[:, 0, 0] = -cos_theta * scale
+        G[:, 0, 1] = sin_theta * scale
+        G[:, 1, 0] = -sin_theta * scale
+        G[:, 1, 1] = -cos_theta * scale
+        G[:, 2, 2] = dt
+        # d(x, y) / d(theta)
+        F = self._jacobian
+        F[:, 0, 2] = (forward_speed * sin_theta + sideways_speed * cos_theta) * scale
+        F[:, 1, 2] = (-forward_speed * cos_theta + sideways_speed * sin_theta) * scale
+
+        state[:, 0] += G[:, 0, 0] * forward_speed + G[:, 0, 1] * sideways_speed
+        state[:, 1] += G[:, 1, 0] * forward_speed + G[:, 1, 1] * sideways_speed
+        state[:, 2] += velocities[:, 2] * dt
+        # P = F P F^T + G Q G^T
+        product = self._product
+        np.matmul(F, covariance, out=product)
+        np.matmul(product, np.swapaxes(F, 1, 2), out=covariance)
+        np.matmul(G, noise, out=product)
+        covariance += product @ np.swapaxes(G, 1, 2)
+        return state
+
+    def update(self, measurements, noise, mask=None):
+        # Fuse pose fixes. measurements is (N, 3) for full poses or (N, 2) for
+        # positions only, noise their (3, 3)/(2, 2) or per-robot covariance.
+        # mask selects the robots that got a fix this step.
+        measurements = np.asarray(measurements, dtype=float)
+        noise = np.asarray(noise, dtype=float)
+        axes = measurements.shape[-1]
+        state, covariance = self.state, self.covariance
+        if mask is not None:
+            index = np.flatnonzero(mask)
+            if not len(index):
+                return state
+            state, covariance = state[index], covariance[index]
+            measurements = measurements[index] if len(measurements) == len(self.state) else measurements
+            if noise.ndim == 3:
+                noise = noise[index]
+
+        # H selects the measured axes, so H P H^T and P H^T are slices of P
+        innovation = measurements - state[:, :axes]
+        if axes == 3:
+            innovation[:, 2] = wrap_angle(innovation[:, 2])
+        S = covariance[:, :axes, :axes] + noise
+        gain = covariance[:, :, :axes] @ inverse_small(S)  # K = P H^T S^-1
+        state += np.einsum("nij,nj->ni", gain, innovation)
+        covariance -= gain @ covariance[:, :axes, :]
+        # Keep the covariances exactly symmetric against rounding drift
+        covariance += np.swapaxes(covariance, 1, 2)
+        covariance *= 0.5
+
+        if mask is not None:
+            self.state[index] = state
+            self.covariance[index] = covariance
+        return self.state
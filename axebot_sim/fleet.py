@@ -0,0 +1,142 @@
+import numpy as np
+
+from .integrators import POSITION_SCALE
+from .spatial import SpatialHashGrid, collision_radii, resolve_collisions
+
+# Structure-of-arrays counterpart of axebot_v8.Robot for simulating many robots
+# at once. Every per-robot quantity lives in one contiguous array indexed by
+# robot, and kinematics and integration run as single batched NumPy operations.
+
+
+def transformation_matrices(L, wheel_angles):
+    # (N, 3, 3) stack with the same rows as Robot.get_transformation_matrix:
+    # [sin(a_i), -cos(a_i), -L] for each wheel i of each robot
+    T = np.empty((len(L), 3, 3))
+    np.sin(wheel_angles, out=T[:, :, 0])
+    np.cos(wheel_angles, out=T[:, :, 1])
+    T[:, :, 1] *= -1
+    T[:, :, 2] = -L[:, None]
+    return T
+
+
+class RobotFleet:
+    def __init__(self, positions, orientations, L, wheel_angles, obstacles=None, motors=None, matrix_offset=0):
+        self.positions = np.array(positions, dtype=float).reshape(-1, 2)
+        n = len(self.positions)
+        self.orientations = np.array(np.broadcast_to(orientations, (n,)), dtype=float)  # radians
+        self.L = np.array(np.broadcast_to(L, (n,)), dtype=float)
+        self.wheel_angles = np.radians(np.broadcast_to(wheel_angles, (n, 3)))  # degrees in, like Robot
+        # Degrees added to every wheel angle in the matrices only, like Robot.matrix_offset
+        self.matrix_offset = np.array(np.broadcast_to(matrix_offset, (n,)), dtype=float)
+
+        # World-frame (vx, vy, omega) commands and the per-step results
+        self.commands = np.zeros((n, 3))
+        self.wheel_speeds = np.zeros((n, 3))
+        self.velocities = np.zeros((n, 3))
+        self.body_commands = np.zeros((n, 3))  # Filled by track()
+
+        self.grid = None  # SpatialHashGrid over positions, built on first use
+        self.obstacles = obstacles  # Optional static ObstacleMap shared by every robot
+        # Optional WheelMotors for all robots; wheel_speeds then holds what the
+        # motors deliver rather than the commanded speeds
+        self.motors = motors
+        self.update_geometry()
+
+    @classmethod
+    def from_robots(cls, robots):
+        return cls(
+            positions=[robot.position for robot in robots],
+            orientations=[robot.orientation for robot in robots],
+            L=[robot.L for robot in robots],
+            wheel_angles=[np.degrees(robot.wheel_angles) for robot in robots],
+            matrix_offset=[robot.matrix_offset for robot in robots]
+        )
+
+    def __len__(self):
+        return len(self.positions)
+
+    def update_geometry(self):
+        # Rebuild the matrices and their inverses; call after changing L,
+        # wheel_angles or matrix_offset
+        self.T = transformation_matrices(self.L, self.wheel_angles + np.radians(self.matrix_offset)[:, None])
+        self.T_inv = np.linalg.inv(self.T)
+        self.radii = collision_radii(self.L)  # Body or wheel extent, whichever is larger
+        self.grid = None
+
+    def calculate_wheel_speeds(self, commands, out=None):
+        return np.einsum('nij,nj->ni', self.T_inv, commands, out=out)
+
+    def calculate_robot_velocity(self, wheel_speeds, out=None):
+        return np.einsum('nij,nj->ni', self.T, wheel_speeds, out=out)
+
+    def to_world_velocity(self, body_commands, out=None):
+        # Batched Simulation.to_world_velocity: (forward, sideways, omega) rows
+        # relative to each robot's orientation become world-frame (vx, vy, omega)
+        if out is None:
+            out = np.empty_like(body_commands, dtype=float)
+        cos_theta = np.cos(self.orientations)
+        sin_theta = np.sin(self.orientations)
+        forward_speed = body_commands[:, 0]
+        sideways_speed = body_commands[:, 1]
+        out[:, 0] = -forward_speed * cos_theta + sideways_speed * sin_theta
+        out[:, 1] = -forward_speed * sin_theta - sideways_speed * cos_theta
+        out[:, 2] = body_commands[:, 2]
+        return out
+
+    def update(self, velocities, dt):
+        self.positions += velocities[:, :2] * (dt * POSITION_SCALE)
+        self.orientations += velocities[:, 2] * dt
+
+    def spatial_index(self):
+        # Grid over the current positions with cells sized to the largest
+        # collision diameter, so contacts only need the adjacent cells
+        if self.grid is None:
+            self.grid = SpatialHashGrid(2 * self.radii.max() if len(self) else 1.0)
+        self.grid.update(self.positions)
+        return self.grid
+
+    def neighbors(self, index, radius):
+        return self.spatial_index().neighbors(index, radius)
+
+    def query_radius(self, points, radius):
+        return self.spatial_index().query_radius(points, radius)
+
+    def scan(self, sensor, robots=True):
+        # (N, K) readings of the same RangeSensor mounted on every robot, cast
+        # against the obstacle map and, with robots, each other's bodies
+        return sensor.scan(self.positions, self.orientations, self.obstacles, self.radii if robots else None)
+
+    def resolve_collisions(self, iterations=1):
+        # Separate overlapping robots in place; returns the number of contacts
+        if self.grid is None:
+            self.spatial_index()
+        return resolve_collisions(self.positions, self.radii, self.grid, iterations)
+
+    def step(self, dt, n=1, body_commands=None, collide=False):
+        # Advance every robot n steps. Without body_commands the world-frame
+        # self.commands are held; with them they are re-projected each step
+        # from the robots' current orientations, as Simulation does. With
+        # collide, overlapping robots are pushed apart after every step. Robots
+        # that end a step inside an obstacle are pushed back out.
+        for _ in range(n):
+            if body_commands is not None:
+                self.to_world_velocity(body_commands, out=self.commands)
+            self.calculate_wheel_speeds(self.commands, out=self.wheel_speeds)
+            if self.motors is not None:
+                self.motors.step(self.wheel_speeds, dt, out=self.wheel_speeds)
+            self.calculate_robot_velocity(self.wheel_speeds, out=self.velocities)
+            self.update(self.velocities, dt)
+            if collide:
+                self.resolve_collisions()
+            if self.obstacles is not None:
+                self.obstacles.push_out(self.positions, self.radii)
+        return self.wheel_speeds
+
+    def track(self, tracker, dt, n=1, collide=False):
+        # Advance n steps under closed-loop control: a PathTracker (or anything
+        # with its command(positions, orientations, out) method) picks every
+        # robot's body-frame command from its pose before each step
+        for _ in range(n):
+            tracker.command(self.positions, self.orientations, out=self.body_commands)
+            self.step(dt, 1, self.body_commands, collide)
+        return self.wheel_speeds
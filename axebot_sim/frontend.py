@@ -0,0 +1,198 @@
+import math
+
+import numpy as np
+import pygame
+
+from .hud import Hud, ProfilerOverlay
+from .profiler import COLUMNS, DRAW, FLIP, STATUS, TICK
+from .render import DirtyRectRenderer
+from .sprites import get_shared_cache
+
+# pygame front end. Everything that needs pygame lives here and is only
+# imported once a Simulation opens a window or a Robot is drawn, so the core
+# (kinematics, stepping, recording, sweeps) runs without loading SDL.
+
+BACKGROUND = (86, 125, 70)
+OBSTACLE_COLOR = (70, 70, 70)
+RAY_COLOR = (255, 90, 60)
+WHEEL_COLOR = (0, 0, 0)
+
+
+def make_wheel_surface():
+    wheel_surface = pygame.Surface((40, 10), pygame.SRCALPHA)
+    wheel_surface.fill(WHEEL_COLOR)
+    return wheel_surface
+
+
+def make_background(width, height, obstacles=None):
+    # The static scene, rendered once: grass with the obstacle map on top,
+    # scaled from its occupancy grid to world pixels
+    background = pygame.Surface((width, height))
+    background.fill(BACKGROUND)
+    if obstacles is not None:
+        colors = np.where(obstacles.occupancy.T[:, :, None], OBSTACLE_COLOR, BACKGROUND).astype(np.uint8)
+        layer = pygame.surfarray.make_surface(colors)
+        size = (round(obstacles.width), round(obstacles.height))
+        background.blit(pygame.transform.scale(layer, size), (0, 0))
+    return background.convert()
+
+
+class RobotView:
+    # Drawing state for one Robot: the shared wheel sprites and its HUD
+    def __init__(self, robot, wheel_style="sprites", sprite_resolution=1.0, hud=True, hud_rate=None):
+        self.robot = robot
+        self.wheel_style = wheel_style  # "sprites" (rotated rectangles) or "circles"
+        self.sprite_resolution = sprite_resolution  # Degrees per pre-rotated wheel sprite
+        self.show_hud = hud
+        self.hud_rate = hud_rate  # Optional HUD refresh rate in Hz, e.g. 10
+        self.hud = None  # Created on first render so pygame.font is only loaded when needed
+        self.wheel_sprites = None
+        self.show_rays = True  # Debug drawing of the range sensor's last reading, if any
+
+    def draw(self, screen, position, orientation):
+        robot = self.robot
+        x, y = float(position[0]), float(position[1])
+        rects = []
+        if self.show_rays and robot.sensor is not None and robot.ranges is not None:
+            rects += self.draw_rays(screen, position, orientation)
+        rects.append(pygame.draw.circle(screen, robot.color, (int(x), int(y)), 20))
+
+        if self.wheel_style == "circles":
+            for angle in robot.wheel_angles.tolist():
+                wheel_x = x + robot.L * math.cos(angle + orientation)
+                wheel_y = y + robot.L * math.sin(angle + orientation)
+                rects.append(pygame.draw.circle(screen, WHEEL_COLOR, (int(wheel_x), int(wheel_y)), 5))
+            return rects
+
+        if self.wheel_sprites is None:
+            self.wheel_sprites = get_shared_cache("wheel", make_wheel_surface, self.sprite_resolution)
+        # Scalar math module calls are much cheaper than NumPy ufuncs on single values
+        for angle in robot.wheel_angles.tolist():
+            wheel_x = x + robot.L * math.cos(angle + orientation)
+            wheel_y = y + robot.L * math.sin(angle + orientation)
+
+            # Blit the pre-rotated wheel centered on the wheel position
+            wheel_angle_degrees = math.degrees(angle + orientation) + 90
+            rects.append(self.wheel_sprites.blit(screen, -wheel_angle_degrees, (wheel_x, wheel_y)))
+
+        return rects
+
+    def draw_rays(self, screen, position, orientation):
+        # One line per ray up to its hit point, from the drawn pose
+        origins, ends = self.robot.sensor.endpoints(position, orientation, self.robot.ranges)
+        rects = [pygame.draw.line(screen, RAY_COLOR, start, end)
+                 for start, end in zip(origins.tolist(), ends.tolist())]
+        return [rects[0].unionall(rects[1:])] if rects else []
+
+    def render_status(self, screen, q1, q2, q3):
+        if not self.show_hud:
+            return []
+        if self.hud is None:
+            self.hud = Hud(update_rate=self.hud_rate)
+        orientation_deg = (math.degrees(self.robot.orientation) % 360 + 360) % 360
+        return self.hud.draw(screen, [
+            ("Wheel q1 Speed: ", q1, " m/s"),
+            ("Wheel q2 Speed: ", q2, " m/s"),
+            ("Wheel q3 Speed: ", q3, " m/s"),
+            ("Orientation (degrees): ", (360 - orientation_deg) % 360, "")
+        ])
+
+
+class PygameFrontend:
+    # Window, clock, input events and rendering for an interactive Simulation
+    def __init__(self, sim, width, height, caption="Axebot Simulation", dirty_rects=False):
+        self.sim = sim
+        # Only the display (which brings up events and the clock). pygame.init()
+        # would also start audio, joystick and the other subsystems; the font
+        # module is initialized by the HUD on first use.
+        pygame.display.init()
+        self.screen = pygame.display.set_mode((width, height))
+        pygame.display.set_caption(caption)
+        self.clock = pygame.time.Clock()
+        # Plain fill without obstacles; otherwise a pre-rendered surface that
+        # is blitted each frame instead of redrawing the walls
+        self.background = BACKGROUND if sim.obstacles is None else make_background(width, height, sim.obstacles)
+        self._background_version = None if sim.obstacles is None else sim.obstacles.version
+        # Dirty-rect mode redraws and pushes only the areas that changed, which
+        # matters where full-window flips are slow (remote desktops, kiosks)
+        self.renderer = DirtyRectRenderer(self.background) if dirty_rects else None
+        # F3 toggles the profiler overlay when the simulation is profiled
+        self.profiler_overlay = None
+        if sim.profiler is not None:
+            self.profiler_overlay = ProfilerOverlay(sim.profiler, COLUMNS)
+
+    def reset_clock(self):
+        self.clock.tick()
+
+    def tick(self, fps):
+        # Wait for the next frame; returns the elapsed wall-clock seconds
+        return self.clock.tick(fps) / 1000
+
+    def poll_events(self):
+        for event in pygame.event.get():
+            self.handle_event(event)
+
+    def wait(self, timeout_ms=None):
+        # Block until an input event arrives, or for at most timeout_ms
+        event = pygame.event.wait() if timeout_ms is None else pygame.event.wait(timeout_ms)
+        if self.sim.profiler is not None:
+            self.sim.profiler.lap(TICK)
+        if event.type != pygame.NOEVENT:
+            self.handle_event(event)
+
+    def handle_event(self, event):
+        sim = self.sim
+        if event.type == pygame.QUIT:
+            sim.running = False
+        elif event.type == pygame.VIDEOEXPOSE:
+            sim.needs_redraw = True
+            if self.renderer is not None:
+                self.renderer.invalidate()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and self.profiler_overlay is not None:
+            self.profiler_overlay.visible = not self.profiler_overlay.visible
+            sim.needs_redraw = True
+            if self.renderer is not None:
+                self.renderer.invalidate()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and sim.robot.sensor is not None:
+            # F4 toggles the range sensor rays
+            view = sim.robot.view()
+            view.show_rays = not view.show_rays
+            sim.needs_redraw = True
+            if self.renderer is not None:
+                self.renderer.invalidate()
+
+    def render(self, position, orientation):
+        # Draw the robot and render its status
+        sim = self.sim
+        profiler = sim.profiler
+        if sim.obstacles is not None and sim.obstacles.version != self._background_version:
+            # The map was updated: render the walls again
+            self.background = make_background(*self.screen.get_size(), sim.obstacles)
+            self._background_version = sim.obstacles.version
+            if self.renderer is not None:
+                self.renderer.background = self.background
+                self.renderer.invalidate()
+        if self.renderer is not None:
+            self.renderer.erase(self.screen)
+        elif isinstance(self.background, pygame.Surface):
+            self.screen.blit(self.background, (0, 0))
+        else:
+            self.screen.fill(self.background)
+        rects = sim.robot.draw(self.screen, position, orientation)
+        if profiler is not None:
+            profiler.lap(DRAW)
+        rects += sim.robot.render_status(self.screen, *sim.wheel_speeds)
+        if self.profiler_overlay is not None:
+            rects += self.profiler_overlay.draw(self.screen)
+        if profiler is not None:
+            profiler.lap(STATUS)
+
+        if self.renderer is not None:
+            self.renderer.present(rects)
+        else:
+            pygame.display.flip()
+        if profiler is not None:
+            profiler.lap(FLIP)
+
+    def close(self):
+        pygame.quit()
@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+
+import pygame
+
+# HUD text rendering. Rasterizing text is expensive compared to blitting it,
+# so fonts are shared process-wide and rendered lines are cached on their
+# label and quantized value: a line is only re-rendered when the digits it
+# displays change.
+
+_fonts = {}
+
+
+def get_font(size=30):
+    # One default Font per size for the whole process instead of one per Robot
+    font = _fonts.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        if not _fonts:
+            # Fonts die with pygame.quit(); drop them so a later init starts fresh
+            pygame.register_quit(_fonts.clear)
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+
+class TextCache:
+    def __init__(self, font, color=(255, 255, 255), max_size=512):
+        self.font = font
+        self.color = color
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, label, value, suffix="", digits=2):
+        # Quantize to the displayed precision so e.g. 0.501 and 0.504 share a surface
+        quantized = round(value * 10 ** digits)
+        key = (label, quantized, suffix, digits)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        text = f"{label}{quantized / 10 ** digits:.{digits}f}{suffix}"
+        surface = self.font.render(text, True, self.color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+class Hud:
+    def __init__(self, font=None, color=(255, 255, 255), update_rate=None, origin=(10, 10), line_height=30):
+        self.text = TextCache(font if font is not None else get_font(30), color)
+        # Optional refresh rate in Hz; between refreshes the last surfaces are re-blitted
+        self.update_interval = 1 / update_rate if update_rate else 0.0
+        self.origin = origin
+        self.line_height = line_height
+        self._last_update = None
+        self._surfaces = []
+
+    def draw(self, screen, lines, now=None):
+        # lines is a sequence of (label, value, suffix) tuples, one per HUD row.
+        # Returns the rects that were drawn.
+        if now is None:
+            now = time.perf_counter()
+        if self._last_update is None or now - self._last_update >= self.update_interval:
+            self._surfaces = [self.text.render(*line) for line in lines]
+            self._last_update = now
+
+        x, y = self.origin
+        return [screen.blit(surface, (x, y + i * self.line_height)) for i, surface in enumerate(self._surfaces)]
+
+
+class ProfilerOverlay:
+    # p50 / p95 / max per frame phase from a profiler.FrameProfiler, drawn
+    # top-right. Stats are only recomputed and re-rendered update_rate times a
+    # second, so the overlay costs a few blits on other frames.
+    def __init__(self, profiler, columns, color=(255, 255, 0), update_rate=4, size=20, margin=10):
+        self.profiler = profiler
+        self.columns = columns
+        self.font = get_font(size)
+        self.color = color
+        self.update_interval = 1 / update_rate
+        self.margin = margin
+        self.visible = True
+        self._last_update = None
+        self._surfaces = []
+
+    def draw(self, screen, now=None):
+        if not self.visible:
+            return []
+        if now is None:
+            now = time.perf_counter()
+        if self._last_update is None or now - self._last_update >= self.update_interval:
+            stats = self.profiler.stats()
+            rows = [("ms", "p50", "p95", "max")]
+            rows += [(column, *(f"{stats[row, i]:.2f}" for row in range(3))) for i, column in enumerate(self.columns)]
+            # The default font is proportional, so each cell is its own surface
+            self._surfaces = [[self.font.render(cell, True, self.color) for cell in row] for row in rows]
+            self._last_update = now
+
+        label_width = max(row[0].get_width() for row in self._surfaces) + 8
+        value_width = max(cell.get_width() for row in self._surfaces for cell in row[1:]) + 8
+        x = screen.get_width() - self.margin - label_width - value_width * 3
+        y = self.margin
+        rects = []
+        for row in self._surfaces:
+            rects.append(screen.blit(row[0], (x, y)))
+            for i, cell in enumerate(row[1:]):
+                # Right-align values within their column
+                rects.append(screen.blit(cell, (x + label_width + value_width * (i + 1) - cell.get_width(), y)))
+            y += row[0].get_height()
+        return rects
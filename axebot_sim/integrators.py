@@ -0,0 +1,88 @@
+import numpy as np
+
+# Pose integrators for a constant robot-relative command (forward, sideways,
+# omega). The command is projected to world velocities with the current heading
+# exactly as Simulation.to_world_velocity does, so while the robot turns its
+# world velocity turns with it.
+#
+# - euler: the original scheme, heading frozen over the step
+# - rk4: classic fourth order; the heading is linear in time, so this is
+#   Simpson's rule over the rotating velocity
+# - exact: closed-form SE(2) exponential map, exact for any duration, so a
+#   whole constant-command segment can be crossed in one step
+#
+# All functions accept floats or NumPy arrays (e.g. one entry per robot, or
+# sample times for h).
+
+POSITION_SCALE = 100  # Pixels moved per unit of vx, vy and second; scaled up for display
+INTEGRATORS = ("euler", "rk4", "exact")
+
+
+def body_to_world(theta, forward_speed, sideways_speed):
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    return (-forward_speed * cos_theta + sideways_speed * sin_theta,
+            -forward_speed * sin_theta - sideways_speed * cos_theta)
+
+
+def world_to_body(theta, vx, vy):
+    # Inverse of body_to_world (the projection is a rotation, so its transpose)
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    return (-vx * cos_theta - vy * sin_theta,
+            vx * sin_theta - vy * cos_theta)
+
+
+def integrate_euler(x, y, theta, forward_speed, sideways_speed, omega, h):
+    vx, vy = body_to_world(theta, forward_speed, sideways_speed)
+    return x + vx * h * POSITION_SCALE, y + vy * h * POSITION_SCALE, theta + omega * h
+
+
+def integrate_rk4(x, y, theta, forward_speed, sideways_speed, omega, h):
+    vx1, vy1 = body_to_world(theta, forward_speed, sideways_speed)
+    vx2, vy2 = body_to_world(theta + omega * h / 2, forward_speed, sideways_speed)  # k2 == k3
+    vx4, vy4 = body_to_world(theta + omega * h, forward_speed, sideways_speed)
+    scale = h * POSITION_SCALE / 6
+    return (x + (vx1 + 4 * vx2 + vx4) * scale,
+            y + (vy1 + 4 * vy2 + vy4) * scale,
+            theta + omega * h)
+
+
+def integrate_exact(x, y, theta, forward_speed, sideways_speed, omega, h):
+    # With phi = omega * h, the heading integrals are
+    #   int cos(theta + omega t) dt = h (cos(theta) a - sin(theta) b)
+    #   int sin(theta + omega t) dt = h (cos(theta) b + sin(theta) a)
+    # where a = sin(phi) / phi and b = (1 - cos(phi)) / phi, evaluated by
+    # series near phi = 0 to avoid cancellation
+    phi = np.asarray(omega * h, dtype=float)
+    small = np.abs(phi) < 1e-4
+    safe_phi = np.where(small, 1.0, phi)
+    phi2 = phi * phi
+    a = np.where(small, 1 - phi2 / 6 + phi2 * phi2 / 120, np.sin(safe_phi) / safe_phi)
+    b = np.where(small, phi / 2 - phi * phi2 / 24, (1 - np.cos(safe_phi)) / safe_phi)
+
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    integral_cos = h * (cos_theta * a - sin_theta * b)
+    integral_sin = h * (cos_theta * b + sin_theta * a)
+
+    dx = -forward_speed * integral_cos + sideways_speed * integral_sin
+    dy = -forward_speed * integral_sin - sideways_speed * integral_cos
+    return x + dx * POSITION_SCALE, y + dy * POSITION_SCALE, theta + omega * h
+
+
+INTEGRATOR_FUNCTIONS = {
+    "euler": integrate_euler,
+    "rk4": integrate_rk4,
+    "exact": integrate_exact,
+}
+
+
+def constant_segments(controls):
+    # (start, stop) index pairs of runs of identical rows in an (n, 3) command array
+    n = len(controls)
+    if n == 0:
+        return []
+    changes = np.flatnonzero(np.any(controls[1:] != controls[:-1], axis=1)) + 1
+    bounds = [0] + changes.tolist() + [n]
+    return list(zip(bounds[:-1], bounds[1:]))
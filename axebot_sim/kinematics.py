@@ -0,0 +1,317 @@
+import math
+import os
+
+import numpy as np
+
+from .integrators import POSITION_SCALE
+
+# Closed-form omni-wheel kinematics. For a 3x3 system the NumPy call overhead
+# (array creation, inv, @) costs more than the arithmetic, so the hot path
+# works on 18 precomputed scalars: the inverse matrix (command -> wheel speeds)
+# followed by the forward matrix (wheel speeds -> twist), row-major.
+
+
+def transformation_matrix(L, wheel_angles):
+    # Rows [sin(a_i), -cos(a_i), -L], wheel_angles in radians
+    return np.array([
+        [np.sin(wheel_angles[0]), -np.cos(wheel_angles[0]), -L],
+        [np.sin(wheel_angles[1]), -np.cos(wheel_angles[1]), -L],
+        [np.sin(wheel_angles[2]), -np.cos(wheel_angles[2]), -L]
+    ])
+
+
+def kinematics_coefficients(T, T_inv=None):
+    if T_inv is None:
+        T_inv = np.linalg.inv(T)
+    return np.concatenate([np.ravel(T_inv), np.ravel(T)]).astype(float)
+
+
+def make_fused_kinematics(coefficients):
+    # Pure-Python fused kernel: (vx, vy, omega) command -> (q1, q2, q3) wheel
+    # speeds -> resulting (vx, vy, omega), with the coefficients bound as
+    # closure constants so a call is plain float arithmetic
+    (i00, i01, i02, i10, i11, i12, i20, i21, i22,
+     t00, t01, t02, t10, t11, t12, t20, t21, t22) = np.asarray(coefficients).tolist()
+
+    def fused_kinematics(vx, vy, omega):
+        q1 = i00 * vx + i01 * vy + i02 * omega
+        q2 = i10 * vx + i11 * vy + i12 * omega
+        q3 = i20 * vx + i21 * vy + i22 * omega
+        return (
+            q1, q2, q3,
+            t00 * q1 + t01 * q2 + t02 * q3,
+            t10 * q1 + t11 * q2 + t12 * q3,
+            t20 * q1 + t21 * q2 + t22 * q3
+        )
+
+    return fused_kinematics
+
+
+def make_forward_kinematics(coefficients):
+    # Second half of the fused kernel: (q1, q2, q3) -> (vx, vy, omega), for
+    # wheel speeds that differ from the commanded ones (see motors.py)
+    t00, t01, t02, t10, t11, t12, t20, t21, t22 = np.asarray(coefficients)[9:].tolist()
+
+    def forward_kinematics(q1, q2, q3):
+        return (
+            t00 * q1 + t01 * q2 + t02 * q3,
+            t10 * q1 + t11 * q2 + t12 * q3,
+            t20 * q1 + t21 * q2 + t22 * q3
+        )
+
+    return forward_kinematics
+
+
+def integrate_fused_python(coefficients, pose, controls, dt, wheel_speeds, trajectory=None):
+    # Run len(controls) full simulation steps in one call. Each control row is a
+    # robot-relative (forward, sideways, omega) command, projected to the world
+    # frame with the current heading as Simulation.to_world_velocity does.
+    # pose = [x, y, theta] and wheel_speeds (last q1..q3) are updated in place.
+    # If given, row k of trajectory (n, 9) receives the state after step k:
+    # x, y, theta, q1, q2, q3, vx, vy, omega.
+    n = len(controls)
+    if n == 0:
+        return
+    (i00, i01, i02, i10, i11, i12, i20, i21, i22,
+     t00, t01, t02, t10, t11, t12, t20, t21, t22) = np.asarray(coefficients).tolist()
+    x, y, theta = np.asarray(pose).tolist()
+    scale = dt * POSITION_SCALE
+    cos, sin = math.cos, math.sin
+
+    # Python floats are much cheaper than NumPy scalars, so the commands are
+    # converted to lists chunk by chunk to bound memory on long runs
+    for chunk_start in range(0, n, 4096):
+        rows = [] if trajectory is not None else None
+        for forward_speed, sideways_speed, desired_omega in controls[chunk_start:chunk_start + 4096].tolist():
+            cos_theta = cos(theta)
+            sin_theta = sin(theta)
+            desired_vx = -forward_speed * cos_theta + sideways_speed * sin_theta
+            desired_vy = -forward_speed * sin_theta - sideways_speed * cos_theta
+
+            q1 = i00 * desired_vx + i01 * desired_vy + i02 * desired_omega
+            q2 = i10 * desired_vx + i11 * desired_vy + i12 * desired_omega
+            q3 = i20 * desired_vx + i21 * desired_vy + i22 * desired_omega
+
+            vx = t00 * q1 + t01 * q2 + t02 * q3
+            vy = t10 * q1 + t11 * q2 + t12 * q3
+            omega = t20 * q1 + t21 * q2 + t22 * q3
+            x += vx * scale
+            y += vy * scale
+            theta += omega * dt
+            if rows is not None:
+                rows.append((x, y, theta, q1, q2, q3, vx, vy, omega))
+
+        if rows is not None:
+            trajectory[chunk_start:chunk_start + len(rows)] = rows
+
+    pose[0], pose[1], pose[2] = x, y, theta
+    wheel_speeds[0], wheel_speeds[1], wheel_speeds[2] = q1, q2, q3
+
+
+def _integrate_fused_arrays(coefficients, pose, controls, dt, wheel_speeds, trajectory=None):
+    # Same loop as integrate_fused_python written against arrays only, which is
+    # the form Numba compiles to native code
+    n = controls.shape[0]
+    if n == 0:
+        return
+    i00, i01, i02 = coefficients[0], coefficients[1], coefficients[2]
+    i10, i11, i12 = coefficients[3], coefficients[4], coefficients[5]
+    i20, i21, i22 = coefficients[6], coefficients[7], coefficients[8]
+    t00, t01, t02 = coefficients[9], coefficients[10], coefficients[11]
+    t10, t11, t12 = coefficients[12], coefficients[13], coefficients[14]
+    t20, t21, t22 = coefficients[15], coefficients[16], coefficients[17]
+    x, y, theta = pose[0], pose[1], pose[2]
+    scale = dt * POSITION_SCALE
+    q1 = q2 = q3 = 0.0
+
+    for k in range(n):
+        forward_speed, sideways_speed, desired_omega = controls[k, 0], controls[k, 1], controls[k, 2]
+        cos_theta = math.cos(theta)
+        sin_theta = math.sin(theta)
+        desired_vx = -forward_speed * cos_theta + sideways_speed * sin_theta
+        desired_vy = -forward_speed * sin_theta - sideways_speed * cos_theta
+
+        q1 = i00 * desired_vx + i01 * desired_vy + i02 * desired_omega
+        q2 = i10 * desired_vx + i11 * desired_vy + i12 * desired_omega
+        q3 = i20 * desired_vx + i21 * desired_vy + i22 * desired_omega
+
+        vx = t00 * q1 + t01 * q2 + t02 * q3
+        vy = t10 * q1 + t11 * q2 + t12 * q3
+        omega = t20 * q1 + t21 * q2 + t22 * q3
+        x += vx * scale
+        y += vy * scale
+        theta += omega * dt
+        if trajectory is not None:
+            trajectory[k, 0], trajectory[k, 1], trajectory[k, 2] = x, y, theta
+            trajectory[k, 3], trajectory[k, 4], trajectory[k, 5] = q1, q2, q3
+            trajectory[k, 6], trajectory[k, 7], trajectory[k, 8] = vx, vy, omega
+
+    pose[0], pose[1], pose[2] = x, y, theta
+    wheel_speeds[0], wheel_speeds[1], wheel_speeds[2] = q1, q2, q3
+
+
+def integrate_fused_motors_python(coefficients, pose, controls, dt, wheel_speeds, motors, trajectory=None):
+    # integrate_fused_python with the wheel motor model of motors.py between
+    # the commanded and the delivered wheel speeds. motors is (speeds, torques,
+    # parameters) as WheelMotors.kernel_state() returns: the robot's (3,) motor
+    # speeds and torques, updated in place, and one row of (lag rate,
+    # max_speed, peak acceleration, torque-speed slope, braking limit,
+    # max_acceleration, inertia, grip) per wheel. wheel_speeds and the
+    # trajectory get the delivered speeds.
+    n = len(controls)
+    if n == 0:
+        return
+    (i00, i01, i02, i10, i11, i12, i20, i21, i22,
+     t00, t01, t02, t10, t11, t12, t20, t21, t22) = np.asarray(coefficients).tolist()
+    x, y, theta = np.asarray(pose).tolist()
+    motor_speeds, motor_torques, parameters = motors
+    s1, s2, s3 = motor_speeds.tolist()
+    ((r1, m1, p1, k1, b1, a1, n1, g1), (r2, m2, p2, k2, b2, a2, n2, g2),
+     (r3, m3, p3, k3, b3, a3, n3, g3)) = np.asarray(parameters).tolist()
+    scale = dt * POSITION_SCALE
+    cos, sin = math.cos, math.sin
+
+    # The three wheels are unrolled as in WheelMotors.step_one, since a call
+    # per wheel would cost more than its arithmetic
+    for chunk_start in range(0, n, 4096):
+        rows = [] if trajectory is not None else None
+        for forward_speed, sideways_speed, desired_omega in controls[chunk_start:chunk_start + 4096].tolist():
+            cos_theta = cos(theta)
+            sin_theta = sin(theta)
+            desired_vx = -forward_speed * cos_theta + sideways_speed * sin_theta
+            desired_vy = -forward_speed * sin_theta - sideways_speed * cos_theta
+
+            e1 = (i00 * desired_vx + i01 * desired_vy + i02 * desired_omega - s1) * r1
+            limit = b1
+            if e1 * s1 > 0.0:
+                limit = p1 - abs(s1) * k1
+                limit = 0.0 if limit < 0.0 else a1 if limit > a1 else limit
+            e1 = limit if e1 > limit else -limit if e1 < -limit else e1
+            s1 += e1 * dt
+            s1 = m1 if s1 > m1 else -m1 if s1 < -m1 else s1
+
+            e2 = (i10 * desired_vx + i11 * desired_vy + i12 * desired_omega - s2) * r2
+            limit = b2
+            if e2 * s2 > 0.0:
+                limit = p2 - abs(s2) * k2
+                limit = 0.0 if limit < 0.0 else a2 if limit > a2 else limit
+            e2 = limit if e2 > limit else -limit if e2 < -limit else e2
+            s2 += e2 * dt
+            s2 = m2 if s2 > m2 else -m2 if s2 < -m2 else s2
+
+            e3 = (i20 * desired_vx + i21 * desired_vy + i22 * desired_omega - s3) * r3
+            limit = b3
+            if e3 * s3 > 0.0:
+                limit = p3 - abs(s3) * k3
+                limit = 0.0 if limit < 0.0 else a3 if limit > a3 else limit
+            e3 = limit if e3 > limit else -limit if e3 < -limit else e3
+            s3 += e3 * dt
+            s3 = m3 if s3 > m3 else -m3 if s3 < -m3 else s3
+            q1, q2, q3 = s1 * g1, s2 * g2, s3 * g3
+
+            vx = t00 * q1 + t01 * q2 + t02 * q3
+            vy = t10 * q1 + t11 * q2 + t12 * q3
+            omega = t20 * q1 + t21 * q2 + t22 * q3
+            x += vx * scale
+            y += vy * scale
+            theta += omega * dt
+            if rows is not None:
+                rows.append((x, y, theta, q1, q2, q3, vx, vy, omega))
+
+        if rows is not None:
+            trajectory[chunk_start:chunk_start + len(rows)] = rows
+
+    pose[0], pose[1], pose[2] = x, y, theta
+    wheel_speeds[0], wheel_speeds[1], wheel_speeds[2] = q1, q2, q3
+    motor_speeds[0], motor_speeds[1], motor_speeds[2] = s1, s2, s3
+    motor_torques[0], motor_torques[1], motor_torques[2] = e1 * n1, e2 * n2, e3 * n3
+
+
+def _integrate_fused_motors_arrays(coefficients, pose, controls, dt, wheel_speeds, motor_speeds, motor_torques,
+                                   parameters, trajectory=None):
+    # integrate_fused_motors_python against arrays only, for Numba
+    n = controls.shape[0]
+    if n == 0:
+        return
+    x, y, theta = pose[0], pose[1], pose[2]
+    scale = dt * POSITION_SCALE
+    commands = np.empty(3)
+    delivered = np.empty(3)
+
+    for k in range(n):
+        forward_speed, sideways_speed, desired_omega = controls[k, 0], controls[k, 1], controls[k, 2]
+        cos_theta = math.cos(theta)
+        sin_theta = math.sin(theta)
+        desired_vx = -forward_speed * cos_theta + sideways_speed * sin_theta
+        desired_vy = -forward_speed * sin_theta - sideways_speed * cos_theta
+        for j in range(3):
+            commands[j] = (coefficients[3 * j] * desired_vx + coefficients[3 * j + 1] * desired_vy
+                           + coefficients[3 * j + 2] * desired_omega)
+
+        for j in range(3):
+            speed, max_speed = motor_speeds[j], parameters[j, 1]
+            acceleration = (commands[j] - speed) * parameters[j, 0]
+            limit = parameters[j, 4]
+            if acceleration * speed > 0.0:
+                limit = min(max(parameters[j, 2] - abs(speed) * parameters[j, 3], 0.0), parameters[j, 5])
+            acceleration = min(max(acceleration, -limit), limit)
+            motor_torques[j] = acceleration * parameters[j, 6]
+            motor_speeds[j] = min(max(speed + acceleration * dt, -max_speed), max_speed)
+            delivered[j] = motor_speeds[j] * parameters[j, 7]
+
+        q1, q2, q3 = delivered[0], delivered[1], delivered[2]
+        vx = coefficients[9] * q1 + coefficients[10] * q2 + coefficients[11] * q3
+        vy = coefficients[12] * q1 + coefficients[13] * q2 + coefficients[14] * q3
+        omega = coefficients[15] * q1 + coefficients[16] * q2 + coefficients[17] * q3
+        x += vx * scale
+        y += vy * scale
+        theta += omega * dt
+        if trajectory is not None:
+            trajectory[k, 0], trajectory[k, 1], trajectory[k, 2] = x, y, theta
+            trajectory[k, 3], trajectory[k, 4], trajectory[k, 5] = q1, q2, q3
+            trajectory[k, 6], trajectory[k, 7], trajectory[k, 8] = vx, vy, omega
+
+    pose[0], pose[1], pose[2] = x, y, theta
+    wheel_speeds[0], wheel_speeds[1], wheel_speeds[2] = delivered[0], delivered[1], delivered[2]
+
+
+# Numba is optional and only imported when a batch is long enough to pay for
+# it: importing it and loading the cached kernel takes around half a second,
+# as long as the Python kernel needs for a few hundred thousand steps, which
+# would dominate short headless jobs. Once loaded it is used for every batch.
+# AXEBOT_NUMBA=0 never uses it, AXEBOT_NUMBA=1 always does.
+NUMBA_MIN_STEPS = 500000
+_numba_kernels = {}  # Array kernel -> compiled kernel, or False if unavailable or disabled
+
+
+def load_numba_kernel(motors=False):
+    # The compiled kernel (with the motor model if motors), or None without
+    # Numba. Compiled code is cached on disk, so only the first process ever
+    # pays for compilation.
+    function = _integrate_fused_motors_arrays if motors else _integrate_fused_arrays
+    kernel = _numba_kernels.get(function)
+    if kernel is None:
+        kernel = _numba_kernels[function] = False
+        if os.environ.get("AXEBOT_NUMBA") != "0":
+            try:
+                import numba
+            except ImportError:
+                pass
+            else:
+                kernel = _numba_kernels[function] = numba.njit(cache=True)(function)
+    return kernel or None
+
+
+def integrate_fused(coefficients, pose, controls, dt, wheel_speeds, trajectory=None, motors=None):
+    # integrate_fused_python or its Numba-compiled equivalent, see above; with
+    # motors (see integrate_fused_motors_python) the motor model runs too
+    function = _integrate_fused_arrays if motors is None else _integrate_fused_motors_arrays
+    kernel = _numba_kernels.get(function)
+    if kernel is None and (len(controls) >= NUMBA_MIN_STEPS or os.environ.get("AXEBOT_NUMBA") == "1"):
+        kernel = load_numba_kernel(motors is not None)
+    if motors is None:
+        (kernel or integrate_fused_python)(coefficients, pose, controls, dt, wheel_speeds, trajectory)
+    elif kernel:
+        kernel(coefficients, pose, controls, dt, wheel_speeds, *motors, trajectory)
+    else:
+        integrate_fused_motors_python(coefficients, pose, controls, dt, wheel_speeds, motors, trajectory)
@@ -0,0 +1,159 @@
+import numpy as np
+
+# Optional wheel motor model. Without it the kinematics assume every wheel
+# reaches its commanded speed instantly and without limit. WheelMotors sits
+# between the inverse kinematics (commanded wheel speeds) and the forward
+# kinematics (what the wheels deliver to the ground), for every wheel of every
+# robot at once:
+# - first-order lag towards the command with time constant time_constant,
+#   discretized exactly so any dt is stable
+# - torque saturation on a linear torque-speed curve: the torque available to
+#   speed a wheel up falls to zero at max_speed, braking gets full max_torque
+# - an acceleration limit, like a motor controller's ramp
+# - speed saturation at max_speed
+# - slip: the ground only sees (1 - slip) of the wheel speed
+# Parameters are scalars or anything broadcastable to (robots, 3); the state
+# and scratch arrays are allocated once.
+
+_HUGE = 1e300  # Stands in for an unlimited torque so 0 * limit stays 0
+
+
+class WheelMotors:
+    def __init__(self, count=1, time_constant=0.05, max_speed=np.inf, max_torque=np.inf, inertia=1.0,
+                 max_acceleration=np.inf, slip=0.0):
+        shape = (count, 3)
+
+        def per_wheel(value):
+            return np.array(np.broadcast_to(np.asarray(value, dtype=float), shape))
+
+        self.time_constant = per_wheel(time_constant)  # Seconds
+        self.max_speed = per_wheel(max_speed)  # Wheel speed units, like q1..q3
+        self.max_torque = per_wheel(max_torque)
+        self.inertia = per_wheel(inertia)
+        self.max_acceleration = per_wheel(max_acceleration)  # Wheel speed per second
+        self.slip = per_wheel(slip)
+        self.update_parameters()
+
+        self.speeds = np.zeros(shape)  # Wheel speeds: the motor state
+        self.torques = np.zeros(shape)  # Torque applied during the last step
+        self._acceleration = np.empty(shape)
+        self._limit = np.empty(shape)
+        self._scratch = np.empty(shape)
+        self._braking = np.empty(shape, dtype=bool)
+
+    def __len__(self):
+        return len(self.speeds)
+
+    def update_parameters(self):
+        # Derived constants; call after changing any parameter array in place
+        self._peak_acceleration = np.minimum(self.max_torque / self.inertia, _HUGE)  # At standstill
+        # Accelerating, the available acceleration falls by _slope per unit of
+        # speed; braking always gets the peak, capped by the ramp
+        self._slope = self._peak_acceleration / self.max_speed
+        self._braking_limit = np.minimum(self._peak_acceleration, self.max_acceleration)
+        self._min_speed = -self.max_speed
+        self._grip = 1.0 - self.slip
+        self._robot_grip = self._grip.tolist()
+        self._dt = None
+        self._robot_parameters = {}
+
+    def reset(self, speeds=0.0):
+        self.speeds[:] = speeds
+        self.torques[:] = 0.0
+
+    def step(self, commands, dt, out=None):
+        # Advance all wheels one step towards the (N, 3) commanded speeds and
+        # return the speeds the ground sees, in out if given (may be commands)
+        if dt != self._dt:
+            self._set_dt(dt)
+        speeds, acceleration, limit, scratch = self.speeds, self._acceleration, self._limit, self._scratch
+        # Every call below is a ufunc writing into preallocated arrays: for
+        # small fleets the per-call overhead is most of the cost
+        # Acceleration the lag alone would apply
+        np.subtract(commands, speeds, out=acceleration)
+        acceleration *= self._rate
+        # Torque available on the torque-speed curve, as an acceleration
+        np.abs(speeds, out=limit)
+        limit *= self._slope
+        np.subtract(self._peak_acceleration, limit, out=limit)
+        np.maximum(limit, 0.0, out=limit)
+        np.minimum(limit, self.max_acceleration, out=limit)
+        np.multiply(acceleration, speeds, out=scratch)
+        np.less_equal(scratch, 0.0, out=self._braking)
+        np.copyto(limit, self._braking_limit, where=self._braking)
+        np.minimum(acceleration, limit, out=acceleration)
+        np.negative(limit, out=limit)
+        np.maximum(acceleration, limit, out=acceleration)
+
+        np.multiply(acceleration, self.inertia, out=self.torques)
+        acceleration *= dt
+        speeds += acceleration
+        np.minimum(speeds, self.max_speed, out=speeds)
+        np.maximum(speeds, self._min_speed, out=speeds)
+        if out is None:
+            out = np.empty_like(speeds)
+        return np.multiply(speeds, self._grip, out=out)
+
+    def at_rest(self, speed=1e-9):
+        # Whether every wheel has (all but) stopped. The lag only approaches a
+        # zero command exponentially, so speeds below `speed` count as stopped.
+        return not (np.abs(self.speeds) > speed).any()
+
+    def kernel_state(self, dt, robot=0):
+        # (speeds, torques, parameters) for kinematics.integrate_fused: views
+        # of the robot's motor state and its per-wheel constants for dt
+        if dt != self._dt:
+            self._set_dt(dt)
+        parameters = np.column_stack([self._rate[robot], self.max_speed[robot], self._peak_acceleration[robot],
+                                      self._slope[robot], self._braking_limit[robot], self.max_acceleration[robot],
+                                      self.inertia[robot], self._grip[robot]])
+        return self.speeds[robot], self.torques[robot], parameters
+
+    def step_one(self, q1, q2, q3, dt, robot=0):
+        # Scalar step() for a single robot's wheels, in plain floats; the
+        # interactive loop steps one robot at a time, where array calls dominate
+        if dt != self._dt:
+            self._set_dt(dt)
+        state = self._robot_parameters.get(robot)
+        if state is None:
+            # Plain-float parameters plus views of the robot's state rows,
+            # which are never reallocated, so each step skips the 2-D indexing
+            state = self._robot_parameters[robot] = (list(zip(
+                self._rate[robot].tolist(), self.max_speed[robot].tolist(),
+                self._peak_acceleration[robot].tolist(), self._slope[robot].tolist(),
+                self._braking_limit[robot].tolist(), self.max_acceleration[robot].tolist(),
+                self.inertia[robot].tolist())), self.speeds[robot], self.torques[robot], self._robot_grip[robot])
+        parameters, speed_row, torque_row, (g1, g2, g3) = state
+        speeds, torques = [], []
+        for command, speed, (rate, max_speed, peak, slope, limit, max_acceleration, inertia) in zip(
+                (q1, q2, q3), speed_row.tolist(), parameters):
+            acceleration = (command - speed) * rate
+            if acceleration * speed > 0.0:
+                limit = peak - abs(speed) * slope
+                if limit < 0.0:
+                    limit = 0.0
+                elif limit > max_acceleration:
+                    limit = max_acceleration
+            if acceleration > limit:
+                acceleration = limit
+            elif acceleration < -limit:
+                acceleration = -limit
+            torques.append(acceleration * inertia)
+            speed += acceleration * dt
+            if speed > max_speed:
+                speed = max_speed
+            elif speed < -max_speed:
+                speed = -max_speed
+            speeds.append(speed)
+        speed_row[:] = speeds
+        torque_row[:] = torques
+        return speeds[0] * g1, speeds[1] * g2, speeds[2] * g3
+
+    def _set_dt(self, dt):
+        # Fraction of the gap to the command the lag closes in one step of dt,
+        # and the same per second
+        with np.errstate(divide="ignore"):
+            self._response = -np.expm1(-dt / self.time_constant)
+        self._rate = self._response / dt
+        self._dt = dt
+        self._robot_parameters = {}
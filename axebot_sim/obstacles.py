@@ -0,0 +1,244 @@
+import json
+import math
+
+import numpy as np
+
+# Static obstacle layer. Obstacles are rasterized once into an occupancy grid
+# of square cells (cell_size world pixels each, origin at the top-left corner)
+# and turned into a signed distance field: for every cell, the distance from
+# its center to the nearest obstacle boundary, positive in free space and
+# negative inside obstacles. Clearance and collision checks are then a lookup
+# in the field instead of a test against every wall.
+
+EMPTY_DISTANCE = 1e9  # Stand-in distance on maps without any obstacles
+
+
+def distance_transform(mask):
+    # Euclidean distance in cells from every cell to the nearest True cell.
+    # SciPy's exact transform is used when installed; otherwise an exact NumPy
+    # version that is quadratic in the row length, fine for arena-sized grids.
+    try:
+        from scipy import ndimage
+    except ImportError:
+        ndimage = None
+    if not mask.any():
+        return np.full(mask.shape, EMPTY_DISTANCE)
+    if ndimage is not None:
+        return ndimage.distance_transform_edt(~mask)
+
+    rows, cols = mask.shape
+    # Vertical distance to the nearest True cell in the same column
+    y = np.arange(rows)[:, None]
+    above = np.maximum.accumulate(np.where(mask, y, -EMPTY_DISTANCE), axis=0)
+    below = np.minimum.accumulate(np.where(mask, y, EMPTY_DISTANCE)[::-1], axis=0)[::-1]
+    vertical_sq = np.minimum(y - above, below - y) ** 2
+
+    # Then the nearest over each row: min over x' of (x - x')^2 + vertical^2,
+    # a few rows at a time to bound the (rows, cols, cols) intermediate
+    x = np.arange(cols)
+    horizontal_sq = (x[:, None] - x[None, :]) ** 2
+    out = np.empty(mask.shape)
+    chunk = max(1, 4000000 // (cols * cols))
+    for start in range(0, rows, chunk):
+        block = vertical_sq[start:start + chunk]
+        out[start:start + chunk] = np.min(block[:, None, :] + horizontal_sq[None], axis=2)
+    return np.sqrt(out)
+
+
+def signed_distance(occupancy):
+    # Signed distance in cells from each cell center to the obstacle boundary,
+    # which lies half a cell from the centers on either side of it
+    outside = distance_transform(occupancy)
+    if not occupancy.any():
+        return outside
+    inside = distance_transform(~occupancy)
+    return np.where(occupancy, 0.5 - inside, outside - 0.5)
+
+
+def rasterize_polygons(polygons, rows, cols, cell_size=1.0):
+    # Occupancy grid with every cell whose center lies inside a polygon set.
+    # Each polygon is a sequence of (x, y) vertices in world pixels; the even-odd
+    # test only runs over the cells of the polygon's bounding box.
+    occupancy = np.zeros((rows, cols), dtype=bool)
+    for polygon in polygons:
+        vertices = np.asarray(polygon, dtype=float).reshape(-1, 2)
+        if len(vertices) < 3:
+            continue
+        low = np.floor(vertices.min(axis=0) / cell_size).astype(int)
+        high = np.ceil(vertices.max(axis=0) / cell_size).astype(int)
+        c0, r0 = max(low[0], 0), max(low[1], 0)
+        c1, r1 = min(high[0], cols), min(high[1], rows)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        cx = (np.arange(c0, c1) + 0.5) * cell_size
+        cy = (np.arange(r0, r1) + 0.5) * cell_size
+        px, py = np.meshgrid(cx, cy)
+        inside = np.zeros(px.shape, dtype=bool)
+        for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            if y0 == y1:
+                continue
+            crosses = (y0 > py) != (y1 > py)
+            x_at = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= crosses & (px < x_at)
+        occupancy[r0:r1, c0:c1] |= inside
+    return occupancy
+
+
+def random_walls(width, height, count, length=(40, 200), thickness=8, seed=0):
+    # count axis-aligned wall rectangles scattered over a width x height arena,
+    # as polygons for ObstacleMap.from_polygons; for stress tests and benchmarks
+    rng = np.random.default_rng(seed)
+    lengths = rng.uniform(length[0], length[1], count)
+    horizontal = rng.random(count) < 0.5
+    sizes = np.where(horizontal[:, None], np.stack([lengths, np.full(count, thickness)], axis=1),
+                     np.stack([np.full(count, thickness), lengths], axis=1))
+    corners = rng.uniform(0, 1, (count, 2)) * (np.array([width, height]) - sizes)
+    return [[(x, y), (x + w, y), (x + w, y + h), (x, y + h)] for (x, y), (w, h) in zip(corners.tolist(), sizes.tolist())]
+
+
+class ObstacleMap:
+    def __init__(self, occupancy, cell_size=1.0):
+        # occupancy is a (rows, cols) boolean array indexed [y, x]
+        self.occupancy = np.ascontiguousarray(occupancy, dtype=bool)
+        self.cell_size = float(cell_size)
+        self.rows, self.cols = self.occupancy.shape
+        self.width = self.cols * self.cell_size  # World extent in pixels
+        self.height = self.rows * self.cell_size
+        self.version = 0  # Bumped by every update(), so dependents can tell the map changed
+        self._build_field()
+
+    def update(self, occupancy):
+        # Replace the occupancy grid with one of the same shape, e.g. after
+        # doors open or walls are added, and rebuild the distance field
+        occupancy = np.ascontiguousarray(occupancy, dtype=bool)
+        if occupancy.shape != self.occupancy.shape:
+            raise ValueError(f"occupancy must have shape {self.occupancy.shape}, got {occupancy.shape}")
+        self.occupancy = occupancy
+        self._build_field()
+        self.version += 1
+
+    def _build_field(self):
+        self.sdf = signed_distance(self.occupancy) * self.cell_size
+        # Unnormalized outward direction, for pushing robots out of walls
+        gradient_y, gradient_x = np.gradient(self.sdf) if min(self.occupancy.shape) > 1 else (
+            np.zeros_like(self.sdf), np.zeros_like(self.sdf))
+        self.gradient = np.stack([gradient_x, gradient_y], axis=-1)
+        # (distance, gradient x, gradient y) per cell with the last row and
+        # column repeated, so sample() reads any 2x2 neighborhood in one slice
+        self._patches = np.pad(np.dstack([self.sdf, self.gradient]), ((0, 1), (0, 1), (0, 0)), mode="edge")
+
+    @classmethod
+    def from_polygons(cls, polygons, width, height, cell_size=1.0):
+        rows, cols = math.ceil(height / cell_size), math.ceil(width / cell_size)
+        return cls(rasterize_polygons(polygons, rows, cols, cell_size), cell_size)
+
+    @classmethod
+    def from_image(cls, path, cell_size=1.0, threshold=128):
+        # Dark pixels (luminance below threshold) are obstacles; one pixel per
+        # cell. pygame is only imported to decode the image.
+        import pygame
+
+        pixels = pygame.surfarray.array3d(pygame.image.load(str(path))).astype(float)  # (x, y, rgb)
+        luminance = pixels @ (0.299, 0.587, 0.114)
+        return cls(luminance.T < threshold, cell_size)
+
+    @classmethod
+    def load(cls, path, cell_size=1.0):
+        # .json: {"width", "height", "cell_size" (optional), "polygons": [[[x, y], ...], ...]}
+        # .npy: a boolean occupancy grid; anything else is decoded as an image
+        path = str(path)
+        if path.endswith(".json"):
+            with open(path) as f:
+                spec = json.load(f)
+            return cls.from_polygons(spec["polygons"], spec["width"], spec["height"],
+                                     spec.get("cell_size", cell_size))
+        if path.endswith(".npy"):
+            return cls(np.load(path), cell_size)
+        return cls.from_image(path, cell_size)
+
+    def clearance(self, x, y):
+        # Scalar fast path: signed distance at the cell containing (x, y)
+        x, y = float(x), float(y)
+        col = min(max(int(x / self.cell_size), 0), self.cols - 1)
+        row = min(max(int(y / self.cell_size), 0), self.rows - 1)
+        return self.sdf.item(row, col)
+
+    def sample(self, x, y):
+        # Scalar counterpart of distance() and normal() for a single robot:
+        # (distance, normal_x, normal_y) as plain floats, without array overhead
+        x, y = float(x), float(y)
+        u = min(max(x / self.cell_size - 0.5, 0.0), self.cols - 1)
+        v = min(max(y / self.cell_size - 0.5, 0.0), self.rows - 1)
+        col, row = int(u), int(v)
+        fu, fv = u - col, v - row
+        (a, b), (c, d) = self._patches[row:row + 2, col:col + 2].tolist()
+        w00, w01, w10, w11 = (1 - fu) * (1 - fv), fu * (1 - fv), (1 - fu) * fv, fu * fv
+        distance = w00 * a[0] + w01 * b[0] + w10 * c[0] + w11 * d[0]
+        gx = w00 * a[1] + w01 * b[1] + w10 * c[1] + w11 * d[1]
+        gy = w00 * a[2] + w01 * b[2] + w10 * c[2] + w11 * d[2]
+        # Beyond the map the field grows with the distance past its edge
+        outside_x = max(-x, x - self.width, 0.0)
+        outside_y = max(-y, y - self.height, 0.0)
+        if outside_x or outside_y:
+            distance += math.hypot(outside_x, outside_y)
+            gx = math.copysign(outside_x, x) if outside_x else gx
+            gy = math.copysign(outside_y, y) if outside_y else gy
+        length = math.hypot(gx, gy) or 1.0
+        return distance, gx / length, gy / length
+
+    def distance(self, points):
+        # Bilinearly interpolated signed distance at (N, 2) points; beyond the
+        # map it grows with the distance past the nearest edge
+        points = np.asarray(points, dtype=float)
+        outside = np.maximum(np.maximum(-points, points - (self.width, self.height)), 0)
+        return self._interpolate(self.sdf, points) + np.hypot(outside[..., 0], outside[..., 1])
+
+    def normal(self, points):
+        # Unit direction of increasing distance (away from the nearest wall)
+        points = np.asarray(points, dtype=float)
+        gradient = self._interpolate(self.gradient, points)
+        outside = np.maximum(np.maximum(-points, points - (self.width, self.height)), 0)
+        gradient = np.where(outside > 0, np.copysign(outside, points), gradient)
+        length = np.hypot(gradient[..., 0], gradient[..., 1])
+        return gradient / np.where(length > 0, length, 1.0)[..., None]
+
+    def collides(self, points, radius):
+        return self.distance(points) < radius
+
+    def push_out(self, positions, radii):
+        # Move every circle that overlaps an obstacle out along the distance
+        # gradient, in place. Returns the number of circles moved.
+        positions = np.asarray(positions)
+        if positions.ndim == 1:
+            distance, normal_x, normal_y = self.sample(positions[0], positions[1])
+            penetration = float(radii) - distance
+            if penetration <= 0:
+                return 0
+            positions[0] += normal_x * penetration
+            positions[1] += normal_y * penetration
+            return 1
+        distance = self.distance(positions)
+        penetration = np.asarray(radii, dtype=float) - distance
+        hit = penetration > 0
+        if not hit.any():
+            return 0
+        penetration = np.broadcast_to(penetration, hit.shape)
+        positions[hit] += self.normal(positions[hit]) * penetration[hit][:, None]
+        return int(hit.sum())
+
+    def _interpolate(self, field, points):
+        points = np.asarray(points, dtype=float)
+        # Fractional cell coordinates relative to cell centers
+        u = np.clip(points[..., 0] / self.cell_size - 0.5, 0, self.cols - 1)
+        v = np.clip(points[..., 1] / self.cell_size - 0.5, 0, self.rows - 1)
+        c0 = np.minimum(u.astype(int), max(self.cols - 2, 0))
+        r0 = np.minimum(v.astype(int), max(self.rows - 2, 0))
+        c1 = np.minimum(c0 + 1, self.cols - 1)
+        r1 = np.minimum(r0 + 1, self.rows - 1)
+        fu = u - c0
+        fv = v - r0
+        if field.ndim == 3:
+            fu, fv = fu[..., None], fv[..., None]
+        top = field[r0, c0] * (1 - fu) + field[r0, c1] * fu
+        bottom = field[r1, c0] * (1 - fu) + field[r1, c1] * fu
+        return top * (1 - fv) + bottom * fv
@@ -0,0 +1,104 @@
+import numpy as np
+
+from .integrators import POSITION_SCALE
+
+# Simulated wheel encoders and IMU yaw rate with Gaussian noise and constant
+# bias, and dead reckoning from them. Measurements are derived from the wheel
+# speeds and omega the simulation already produces: the q1..q3 and omega
+# columns of a step() trajectory or TrajectoryLog, or RobotFleet.wheel_speeds
+# and velocities.
+#
+# Every robot draws from its own random stream, spawned from one seed, so a
+# robot's noise does not depend on how many robots there are or on how the
+# steps are batched. Samples come out of large pre-generated blocks rather
+# than one generator call per step.
+
+
+class NoiseStreams:
+    def __init__(self, robots, columns, seed=None, block_size=1 << 22):
+        # block_size bounds the floats generated at once over all robots
+        self.robots = robots
+        self.columns = columns
+        self.generators = [np.random.Generator(np.random.PCG64(child))
+                           for child in np.random.SeedSequence(seed).spawn(robots)]
+        self.block_steps = max(1, block_size // max(1, robots * columns))
+        self._block = np.empty((robots, self.block_steps, columns))
+        self._used = self.block_steps  # Steps of the current block already handed out
+
+    def normal(self, steps, out=None):
+        # (steps, robots, columns) standard normal samples, consecutive in
+        # each robot's stream
+        if out is None:
+            out = np.empty((steps, self.robots, self.columns))
+        done = 0
+        while done < steps:
+            if self._used == self.block_steps:
+                self._refill()
+            take = min(steps - done, self.block_steps - self._used)
+            out[done:done + take] = self._block[:, self._used:self._used + take].transpose(1, 0, 2)
+            self._used += take
+            done += take
+        return out
+
+    def _refill(self):
+        for generator, block in zip(self.generators, self._block):
+            generator.standard_normal(out=block)
+        self._used = 0
+
+
+class OdometryModel:
+    def __init__(self, robots=1, seed=None, encoder_noise=0.0, encoder_bias=0.0, gyro_noise=0.0, gyro_bias=0.0,
+                 block_size=1 << 22):
+        # *_noise: standard deviation of the white noise on every sample
+        # *_bias: standard deviation of a constant offset drawn once per
+        # robot (and per wheel for the encoders) from the robot's stream.
+        # Encoders read wheel speeds, the gyro reads omega.
+        self.robots = robots
+        self.encoder_noise = encoder_noise
+        self.gyro_noise = gyro_noise
+        self.streams = NoiseStreams(robots, 4, seed, block_size)
+        bias = self.streams.normal(1)[0]
+        self.encoder_bias = bias[:, :3] * encoder_bias  # (robots, 3)
+        self.gyro_bias = bias[:, 3] * gyro_bias  # (robots,)
+
+    def measure(self, wheel_speeds, omega, out=None):
+        # Noisy (encoders, gyro) for true wheel_speeds (steps, robots, 3) and
+        # omega (steps, robots); a single robot's (steps, 3) and (steps,) work
+        # too and keep their shape. out may be a preallocated
+        # (steps, robots, 4) array that receives encoders and gyro side by side.
+        wheel_speeds = np.asarray(wheel_speeds, dtype=float)
+        single = wheel_speeds.ndim == 2
+        wheel_speeds = wheel_speeds.reshape(len(wheel_speeds), -1, 3)
+        omega = np.asarray(omega, dtype=float).reshape(len(wheel_speeds), -1)
+        samples = self.streams.normal(len(wheel_speeds), out)
+        encoders, gyro = samples[..., :3], samples[..., 3]
+        encoders *= self.encoder_noise
+        encoders += self.encoder_bias
+        encoders += wheel_speeds
+        gyro *= self.gyro_noise
+        gyro += self.gyro_bias
+        gyro += omega
+        if single:
+            return encoders[:, 0], gyro[:, 0]
+        return encoders, gyro
+
+
+def dead_reckon(T, encoders, dt, pose=(0.0, 0.0, 0.0), gyro=None):
+    # Pose estimates after each step from measured wheel speeds, through the
+    # forward kinematics T @ q as the simulation moves the robot. T is one
+    # robot's (3, 3) matrix or a fleet's (robots, 3, 3) stack; encoders is
+    # (steps, 3) or (steps, robots, 3) to match. Heading comes from the gyro
+    # rates when given, otherwise from the encoders. Returns x, y, theta
+    # stacked on the last axis.
+    encoders = np.asarray(encoders, dtype=float)
+    if encoders.ndim == 2:
+        velocities = encoders @ np.asarray(T).T
+    else:
+        velocities = np.einsum("rij,nrj->nri", T, encoders)
+    if gyro is not None:
+        velocities[..., 2] = gyro
+    velocities[..., :2] *= dt * POSITION_SCALE
+    velocities[..., 2] *= dt
+    np.cumsum(velocities, axis=0, out=velocities)
+    velocities += pose
+    return velocities
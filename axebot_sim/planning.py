@@ -0,0 +1,447 @@
+import heapq
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+# Global path planning around an ObstacleMap. The map's signed distance field
+# is sampled at the center of every planning cell, and cells with less
+# clearance than the robot radius are blocked, so the search treats the robot
+# as a point. Paths come back as (K, 2) world-pixel waypoints from the start
+# to the goal, ready for a PathTracker.
+#
+# Searches run in pure Python over flat lists (one entry per cell of the grid
+# padded with a blocked border, so neighbors never need bounds checks) with a
+# heapq open set. Per-search state is tagged with a search number instead of
+# being cleared, so a short search costs only the cells it touches.
+#
+# - GridPlanner.plan: A* with an LRU cache of plans keyed on the start and
+#   goal cells, grouped quantum pixels at a time; repeated queries skip the
+#   search
+# - DStarLite: keeps its search tree towards a fixed goal and repairs it
+#   where the map changed, for robots that replan as walls move
+#
+# Grid paths are pulled taut along lines of sight (as a visibility graph
+# would route them) unless smooth=False, leaving waypoints only at corners.
+
+# Diagonal move cost, sqrt(2) rounded to a multiple of 2**-20 so that path
+# costs and heuristics sum exactly in floats. Equal costs reached along
+# different paths then compare equal, which D* Lite's key order relies on.
+_DIAGONAL = round(math.sqrt(2) * 2 ** 20) / 2 ** 20
+
+
+class GridPlanner:
+    def __init__(self, obstacles, radius=0.0, cell_size=None, cache_size=256, quantum=None, smooth=True):
+        # radius: clearance to keep from walls, usually the robot's radius.
+        # cell_size: planning resolution in pixels, the map's by default;
+        # coarser grids search faster but may close narrow gaps.
+        # quantum: starts and goals in the same block of cells this wide share
+        # cached plans (default: one planning cell). A plan made from another
+        # cell of the block is only reused if the robot sees its first
+        # waypoint, and the last one sees the goal.
+        self.obstacles = obstacles
+        self.radius = float(radius)
+        self.cell_size = float(obstacles.cell_size if cell_size is None else cell_size)
+        self.rows = math.ceil(obstacles.height / self.cell_size)
+        self.cols = math.ceil(obstacles.width / self.cell_size)
+        self.quantum = self.cell_size if quantum is None else float(quantum)
+        self._block = max(1, round(self.quantum / self.cell_size))  # Cells per cache key step
+        self.smooth = smooth
+        self.cache_size = cache_size
+        # (start key, goal key) -> (waypoints or None, cells they cross, start cell, goal cell)
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expanded = 0  # Cells expanded by the last search
+
+        width = self._width = self.cols + 2
+        # Neighbor moves as (offset, cost, corner, corner): a diagonal move
+        # needs both cells it cuts past free, a straight one only its target
+        self._moves = [(offset, 1.0, offset, offset) for offset in (1, -1, width, -width)] + [
+            (dy * width + dx, _DIAGONAL, dx, dy * width) for dy in (-1, 1) for dx in (-1, 1)]
+        # Each cell's open moves are a bit mask over _moves (see _update_grid),
+        # and _move_sets lists the (offset, cost) pairs of every mask, so the
+        # searches never test the grid cell by cell
+        self._move_sets = [[(offset, cost) for bit, (offset, cost, _, _) in enumerate(self._moves) if mask >> bit & 1]
+                           for mask in range(1 << len(self._moves))]
+        size = (self.rows + 2) * width
+        self._stamp = [0] * size  # Search number that last reached each cell
+        self._closed = [0] * size
+        self._cost = [0.0] * size
+        self._parent = [0] * size
+        self._search = 0
+        self._grid = None
+        self._version = None
+        self._update_grid()
+
+    def __len__(self):
+        return len(self.cache)
+
+    def plan(self, start, goal):
+        # (K, 2) waypoints from start to goal, or None if the goal can't be
+        # reached; both are world (x, y) positions
+        self._update_grid()
+        start = (float(start[0]), float(start[1]))
+        goal = (float(goal[0]), float(goal[1]))
+        start_node, goal_node = self.node(*start), self.node(*goal)
+        # Keys quantize the cells node() snaps to, so a plan searched from the
+        # same cells is reused as is
+        block, width = self._block, self._width
+        key = (start_node // width // block, start_node % width // block,
+               goal_node // width // block, goal_node % width // block)
+        entry = self.cache.get(key)
+        if entry is not None and (entry[2] == start_node and entry[3] == goal_node
+                                  or self._reachable(entry[0], start, goal)):
+            self.cache.move_to_end(key)
+            self.hits += 1
+            waypoints = entry[0]
+        else:
+            self.misses += 1
+            cells = self._astar(start_node, goal_node)
+            waypoints = None if cells is None else self.waypoints(cells)
+            if self.cache_size:
+                self.cache[key] = (waypoints, self._crossed(waypoints), start_node, goal_node)
+                self.cache.move_to_end(key)
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        if waypoints is None:
+            return None
+        waypoints = waypoints.copy()
+        waypoints[0], waypoints[-1] = start, goal
+        return waypoints
+
+    def plan_many(self, starts, goals):
+        # One plan per (start, goal) pair, e.g. for a PathTracker over a fleet;
+        # robots heading the same way share cached plans
+        return [self.plan(start, goal) for start, goal in zip(np.asarray(starts).tolist(), np.asarray(goals).tolist())]
+
+    def replanner(self, goal):
+        return DStarLite(self, goal)
+
+    def node(self, x, y):
+        # Flat index of the padded grid cell containing (x, y), clamped to the map
+        col = min(max(int(x // self.cell_size), 0), self.cols - 1)
+        row = min(max(int(y // self.cell_size), 0), self.rows - 1)
+        return (row + 1) * self._width + col + 1
+
+    def waypoints(self, cells):
+        # World-pixel centers of a search's path cells, pulled taut if smooth
+        row, col = np.divmod(np.asarray(cells, dtype=np.intp), self._width)
+        points = np.column_stack([(col - 0.5) * self.cell_size, (row - 0.5) * self.cell_size])
+        if len(points) < 2:
+            return np.concatenate([points, points])  # Start and goal in one cell
+        if not self.smooth or len(points) < 3:
+            return points
+        keep = [0]
+        while keep[-1] < len(points) - 1:
+            keep.append(self._farthest_visible(points, keep[-1]))
+        return points[keep]
+
+    def _farthest_visible(self, points, anchor):
+        # Far path point still in sight of points[anchor]: probe 1, 2, 4, ...
+        # points ahead in one batch, then bisect between the last probe in
+        # sight and the first one out of it
+        last = len(points) - 1
+        probes = [anchor + (1 << k) for k in range((last - anchor).bit_length()) if anchor + (1 << k) < last] + [last]
+        visible = self.visible(points[anchor], points[probes])
+        if visible.all():
+            return last
+        blocked = int(np.argmin(visible))
+        if blocked == 0:
+            return anchor + 1  # Neighboring path cells always see each other
+        good, bad = probes[blocked - 1], probes[blocked]
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if self.visible(points[anchor], points[middle])[0]:
+                good = middle
+            else:
+                bad = middle
+        return good
+
+    def visible(self, origin, targets):
+        # Whether the straight line from origin to each target stays in free
+        # cells, sampled every half cell
+        row, col = self._line_cells(origin, targets)
+        return self._grid[row, col].all(axis=0)
+
+    def _line_cells(self, origins, targets):
+        # Padded grid (row, col) of points every half cell (or closer) along
+        # the straight lines from origins, one or one per target, to targets,
+        # as (samples, lines) arrays
+        origins = np.asarray(origins, dtype=float)
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        delta = targets - origins
+        samples = int(np.hypot(delta[:, 0], delta[:, 1]).max() * 2 / self.cell_size) + 2
+        t = np.linspace(0.0, 1.0, samples)[:, None]
+        x = origins[..., 0] + delta[:, 0] * t
+        y = origins[..., 1] + delta[:, 1] * t
+        col = np.clip((x // self.cell_size).astype(np.intp) + 1, 0, self.cols + 1)
+        row = np.clip((y // self.cell_size).astype(np.intp) + 1, 0, self.rows + 1)
+        return row, col
+
+    def _reachable(self, waypoints, start, goal):
+        # Whether a plan made from other cells of the same cache key still
+        # holds with start and goal as its ends. Unreachable goals are searched
+        # again, since another start cell may reach them.
+        if waypoints is None:
+            return False
+        return bool(self.visible(start, waypoints[1:2])[0] and self.visible(goal, waypoints[-2:-1])[0])
+
+    def _crossed(self, waypoints):
+        # Flat indices of the cells a plan's segments cross, as visible()
+        # samples them: blocking any of them invalidates the cached plan
+        if waypoints is None:
+            return np.zeros(0, dtype=np.intp)
+        row, col = self._line_cells(waypoints[:-1], waypoints[1:])
+        return np.unique(row * self._width + col)
+
+    def _update_grid(self):
+        # Rebuild the free-cell grid after the map changed and drop cached
+        # plans it invalidates: those whose segments cross newly blocked
+        # cells, or all of them if cells were freed, since shorter paths may
+        # have opened up
+        if self._version == self.obstacles.version:
+            return
+        self._version = self.obstacles.version
+        x = (np.arange(self.cols) + 0.5) * self.cell_size
+        y = (np.arange(self.rows) + 0.5) * self.cell_size
+        centers = np.stack(np.meshgrid(x, y), axis=-1)
+        grid = np.zeros((self.rows + 2, self.cols + 2), dtype=bool)
+        grid[1:-1, 1:-1] = self.obstacles.distance(centers) > self.radius
+        previous, self._grid = self._grid, grid
+        flat = grid.ravel()
+        self.free = bytearray(flat)  # Flat, for the searches
+        masks = np.zeros(flat.size, dtype=np.intp)
+        for bit, (offset, _, corner_a, corner_b) in enumerate(self._moves):
+            masks[_shift(flat, offset) & _shift(flat, corner_a) & _shift(flat, corner_b)] |= 1 << bit
+        self._masks = masks.tolist()
+        if previous is None:
+            return
+        if (grid & ~previous).any():
+            self.cache.clear()
+            return
+        blocked = (previous & ~grid).ravel()
+        for key in [key for key, (_, cells, _, _) in self.cache.items() if blocked[cells].any()]:
+            del self.cache[key]
+
+    def _astar(self, start, goal):
+        # Cell indices from start to goal, or None. The start may be blocked
+        # (a robot touching a wall), the goal may not.
+        width, masks, move_sets = self._width, self._masks, self._move_sets
+        if not self.free[goal]:
+            self.expanded = 0
+            return None
+        self._search += 1
+        search = self._search
+        stamp, closed, cost, parent = self._stamp, self._closed, self._cost, self._parent
+        goal_row, goal_col = divmod(goal, width)
+        stamp[start], cost[start], parent[start] = search, 0.0, -1
+        heap = [(0.0, 0.0, start)]
+        push, pop = heapq.heappush, heapq.heappop
+        expanded = 0
+        while heap:
+            node = pop(heap)[2]
+            if closed[node] == search:
+                continue
+            closed[node] = search
+            expanded += 1
+            if node == goal:
+                break
+            g = cost[node]
+            for offset, step in move_sets[masks[node]]:
+                neighbor = node + offset
+                new = g + step
+                if stamp[neighbor] == search and new >= cost[neighbor]:
+                    continue
+                stamp[neighbor], cost[neighbor], parent[neighbor] = search, new, node
+                # Octile distance: admissible and consistent for these moves.
+                # Ties go to the deeper cell, which is closer to the goal.
+                dy, dx = divmod(neighbor, width)
+                dy, dx = abs(dy - goal_row), abs(dx - goal_col)
+                push(heap, (new + dx + dy + (_DIAGONAL - 2) * (dx if dx < dy else dy), -new, neighbor))
+        self.expanded = expanded
+        if closed[goal] != search:
+            return None
+        cells = [goal]
+        while cells[-1] != start:
+            cells.append(parent[cells[-1]])
+        cells.reverse()
+        return cells
+
+
+def _shift(flat, offset):
+    # flat[i + offset] for every i, False past either end
+    shifted = np.zeros_like(flat)
+    if offset > 0:
+        shifted[:-offset] = flat[offset:]
+    else:
+        shifted[-offset:] = flat[:len(flat) + offset]
+    return shifted
+
+
+class DStarLite:
+    # Incremental planning towards a fixed goal (Koenig and Likhachev's
+    # D* Lite). The search runs backwards from the goal and keeps its cost
+    # table between plans; after the map changes only the cells whose cost to
+    # the goal changed are searched again. That is a small fraction of a
+    # fresh A* for changes near the robot, as its sensors find them; a wall
+    # cutting the path close to the goal reroutes most of the tree and can
+    # cost more. Get one from GridPlanner.replanner(goal) and call
+    # plan(start) as the robot moves and the map changes.
+    def __init__(self, planner, goal):
+        self.planner = planner
+        planner._update_grid()
+        self.goal = (float(goal[0]), float(goal[1]))
+        self.goal_node = planner.node(*self.goal)
+        size = len(planner.free)
+        self._free = bytes(planner.free)  # The grid the cost tables match
+        self._g = [math.inf] * size  # Cost to the goal as of the last expansion
+        self._rhs = [math.inf] * size  # One-step lookahead of g
+        self._offset = 0.0  # D* Lite's k_m: heuristic drift from start moves
+        self._start = None
+        self._heap = []  # (key, key tiebreak, cell); outdated entries are skipped when popped
+        self.expanded = 0  # Cells expanded by the last plan
+        if planner.free[self.goal_node]:
+            self._rhs[self.goal_node] = 0.0
+            self._heap.append((0.0, 0.0, self.goal_node))
+
+    def plan(self, start):
+        # (K, 2) waypoints from start to the goal, or None if it can't be reached
+        planner = self.planner
+        planner._update_grid()
+        start = (float(start[0]), float(start[1]))
+        node = planner.node(*start)
+        previous, self._start = self._start, node
+        if previous is not None and node != previous:
+            self._offset += self._distance(previous, node)
+            if not planner.free[previous]:
+                self._update(previous)  # No longer the start, so no longer costed
+        if planner.free != self._free:
+            self._apply_changes()
+        if not planner.free[node]:
+            self._update(node)  # A blocked start isn't kept up to date between plans
+        self._compute()
+        cells = self._extract(node)
+        if cells is None:
+            return None
+        waypoints = planner.waypoints(cells)
+        waypoints[0], waypoints[-1] = start, self.goal
+        return waypoints
+
+    def _distance(self, a, b):
+        # Octile distance between two cells, the heuristic
+        width = self.planner._width
+        dy, dx = divmod(a, width)
+        ty, tx = divmod(b, width)
+        dy, dx = abs(dy - ty), abs(dx - tx)
+        return dx + dy + (_DIAGONAL - 2) * min(dx, dy)
+
+    def _push(self, node):
+        best = min(self._g[node], self._rhs[node])
+        heapq.heappush(self._heap, (best + self._distance(self._start, node) + self._offset, best, node))
+
+    def _update(self, node):
+        # Recompute node's lookahead cost from its neighbors and queue it if
+        # inconsistent. Costs run from node to its neighbor, like the forward
+        # search.
+        planner = self.planner
+        g, rhs = self._g, self._rhs
+        if not planner.free[node] and (node == self.goal_node or node != self._start):
+            # Blocked cells are never entered, so they cost nothing to keep:
+            # both values go to infinity and any queued entry for the cell is
+            # skipped as outdated when popped. Neighbors that went through it
+            # are recomputed by the caller.
+            g[node] = rhs[node] = math.inf
+            return
+        if node == self.goal_node:
+            rhs[node] = 0.0
+        else:
+            best = math.inf
+            for offset, step in planner._move_sets[planner._masks[node]]:
+                cost = step + g[node + offset]
+                if cost < best:
+                    best = cost
+            rhs[node] = best
+        if g[node] != rhs[node]:
+            self._push(node)
+
+    def _apply_changes(self):
+        planner = self.planner
+        width = planner._width
+        changed = np.flatnonzero(np.frombuffer(self._free, dtype=np.uint8) != np.frombuffer(planner.free, dtype=np.uint8))
+        self._free = bytes(planner.free)
+        # A changed cell alters the moves into it and the diagonals cutting past it
+        around = changed[:, None] + np.array([0, 1, -1, width, -width, width + 1, width - 1, -width + 1, -width - 1])
+        for node in np.unique(around).tolist():
+            self._update(node)
+
+    def _compute(self):
+        planner = self.planner
+        free, masks, move_sets, width = planner.free, planner._masks, planner._move_sets, planner._width
+        g, rhs, heap, start, goal, offset = self._g, self._rhs, self._heap, self._start, self.goal_node, self._offset
+        start_row, start_col = divmod(start, width)
+        # Moves out of a blocked start, which no neighbor's expansion reaches
+        start_moves = {} if free[start] else {start + move: step for move, step in move_sets[masks[start]]}
+        push, pop = heapq.heappush, heapq.heappop
+        expanded = 0
+        while heap:
+            best = min(g[start], rhs[start])
+            if heap[0] >= (best + offset, best) and rhs[start] == g[start]:
+                break
+            k1, k2, node = pop(heap)
+            value = rhs[node]
+            if g[node] == value:
+                continue  # Outdated entry of a consistent cell
+            best = min(g[node], value)
+            row, col = divmod(node, width)
+            dy, dx = abs(row - start_row), abs(col - start_col)
+            key = best + dx + dy + (_DIAGONAL - 2) * (dx if dx < dy else dy) + offset
+            if (k1, k2) < (key, best):
+                push(heap, (key, best, node))  # The start moved since it was queued
+                continue
+            expanded += 1
+            if g[node] > value:
+                # Cost to the goal fell: it can only lower the neighbors' lookahead
+                g[node] = value
+                if free[node]:
+                    for move, step in move_sets[masks[node]]:
+                        neighbor = node + move
+                        cost = value + step
+                        if cost < rhs[neighbor] and neighbor != goal:
+                            rhs[neighbor] = cost
+                            self._push(neighbor)
+                if node in start_moves and value + start_moves[node] < rhs[start]:
+                    rhs[start] = value + start_moves[node]
+                    self._push(start)
+            else:
+                # Cost to the goal rose: recompute the neighbors whose
+                # lookahead went through node
+                old = g[node]
+                g[node] = math.inf
+                self._update(node)
+                if free[node]:
+                    for move, step in move_sets[masks[node]]:
+                        if rhs[node + move] == step + old:
+                            self._update(node + move)
+                if node in start_moves and rhs[start] == start_moves[node] + old:
+                    self._update(start)
+        self.expanded = expanded
+
+    def _extract(self, node):
+        # Follow the cheapest moves from node down to the goal
+        if self._rhs[node] == math.inf:
+            return None
+        planner = self.planner
+        g, masks, move_sets = self._g, planner._masks, planner._move_sets
+        cells = [node]
+        while node != self.goal_node and len(cells) <= len(g):
+            best, following = math.inf, None
+            for move, step in move_sets[masks[node]]:
+                cost = step + g[node + move]
+                if cost < best:
+                    best, following = cost, node + move
+            if following is None:
+                return None
+            node = following
+            cells.append(node)
+        return cells if node == self.goal_node else None
@@ -0,0 +1,74 @@
+# The original standalone scripts as configuration presets. Each preset is a
+# dict of Simulation keyword arguments, so it can be overridden per run, e.g.
+# Simulation.from_preset("v3", dt=0.05), or swept like any other variant.
+#
+# What actually differed between the scripts:
+# - window size, wheel distance L and wheel angle order
+# - matrix_offset: axebot.py to v3 add 90 degrees to every wheel angle when
+#   building the transformation matrix (but not when drawing)
+# - the key map, see KEYMAPS
+# - wheel_style: wheels drawn as small circles until v6, as rotated
+#   rectangles from v7 on
+# - hud: wheel speeds and orientation rendered on screen from v3 on
+#
+# The console prints of the early scripts (global_omega, orientation) are not
+# reproduced; the HUD and the trajectory recorder replace them.
+
+# A key map is one if/elif chain per command axis (0 forward, 1 sideways,
+# 2 omega): the first held key of a chain sets that axis. Factors multiply
+# base_speed on the linear axes and turn_rate on omega; "max" stands for
+# max_speed_ratio. Key names are pygame.K_* suffixes.
+KEYMAPS = {
+    # axebot.py. Its world-frame conversion had the opposite sign of every
+    # later script on both axes; negating the key factors is equivalent.
+    "v0": (
+        (0, (("UP", -1), ("DOWN", 1))),
+        (1, (("LEFT", 1), ("RIGHT", -1))),
+        (2, (("q", -1), ("e", 1))),
+    ),
+    "v1": (
+        (0, (("UP", 1), ("DOWN", -1))),
+        (1, (("LEFT", -1), ("RIGHT", 1))),
+        (2, (("q", -1), ("e", 1))),
+    ),
+    # v2 drove the same way on LEFT and RIGHT; kept as it was
+    "v2": (
+        (1, (("UP", 1), ("DOWN", -1))),
+        (0, (("LEFT", 1), ("RIGHT", 1))),
+        (2, (("q", -1), ("e", 1))),
+    ),
+    "v3": (
+        (1, (("UP", 1), ("DOWN", -1))),
+        (0, (("LEFT", 1), ("RIGHT", -1))),
+        (2, (("q", -1), ("e", 1))),
+    ),
+    # v6 added the "9" boost to max_speed_ratio
+    "v6": (
+        (1, (("UP", 1), ("DOWN", -1), ("9", "max"))),
+        (0, (("LEFT", 1), ("RIGHT", -1))),
+        (2, (("q", -1), ("e", 1))),
+    ),
+}
+DEFAULT_KEYMAP = KEYMAPS["v6"]
+
+_EARLY = dict(width=800, height=600, L=50, wheel_angles=(90, -150, -30), matrix_offset=90, wheel_style="circles")
+_LATE = dict(width=1280, height=720, L=85, wheel_angles=(90, -30, -150), matrix_offset=0)
+
+PRESETS = {
+    "v0": dict(_EARLY, keymap=KEYMAPS["v0"], hud=False),  # axebot.py
+    "v1": dict(_EARLY, keymap=KEYMAPS["v1"], hud=False),
+    "v2": dict(_EARLY, keymap=KEYMAPS["v2"], hud=False),
+    "v3": dict(_EARLY, keymap=KEYMAPS["v3"], hud=True),
+    "v4": dict(_LATE, keymap=KEYMAPS["v3"], hud=True, wheel_style="circles"),
+    "v6": dict(_LATE, keymap=KEYMAPS["v6"], hud=True, wheel_style="circles", base_speed=0.5, max_speed_ratio=6),
+    "v7": dict(_LATE, keymap=KEYMAPS["v6"], hud=True, wheel_style="sprites", base_speed=0.5, max_speed_ratio=6),
+    "v8": dict(_LATE, keymap=KEYMAPS["v6"], hud=True, wheel_style="sprites", base_speed=0.5, max_speed_ratio=6),
+}
+
+
+def get_preset(name, **overrides):
+    # A copy of the named preset with overrides applied
+    if name not in PRESETS:
+        raise ValueError(f"unknown preset {name!r}, expected one of {tuple(PRESETS)}")
+    return dict(PRESETS[name], **overrides)
+
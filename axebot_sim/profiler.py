@@ -0,0 +1,101 @@
+import json
+import math
+from time import perf_counter_ns
+
+import numpy as np
+
+# Per-phase frame profiler for Simulation.run. Each frame is split into phases
+# by calling lap(phase) as each one ends: the time since the previous lap is
+# added to that phase, so phases that repeat within a frame (the physics
+# substeps) accumulate. frame() closes the current frame into a ring buffer
+# holding the last `capacity` frames in nanoseconds, one contiguous row per
+# phase so each can be sorted in place.
+#
+# stats() works entirely in preallocated buffers, so the overlay can read it
+# every refresh without allocating arrays.
+
+PHASES = ("events", "input", "kinematics", "update", "draw", "status", "flip", "tick")
+EVENTS, INPUT, KINEMATICS, UPDATE, DRAW, STATUS, FLIP, TICK = range(len(PHASES))
+COLUMNS = PHASES + ("frame",)  # Per-phase times plus the whole frame
+PERCENTILES = (50, 95, 100)  # p50, p95 and max
+
+
+class FrameProfiler:
+    def __init__(self, capacity=600):
+        self.capacity = capacity  # Frames kept, e.g. 10 s at 60 FPS
+        self.samples = np.zeros((len(COLUMNS), capacity), dtype=np.int64)
+        self.index = 0  # Ring position the next frame is written to
+        self.count = 0  # Buffered frames, up to capacity
+        self.frames = 0  # Frames profiled in total
+        self._current = [0] * len(COLUMNS)
+        self._frame_start = None
+        self._last = 0
+        # Scratch and output buffers for stats()
+        self._sorted = np.empty_like(self.samples)
+        self._stats = np.zeros((len(PERCENTILES), len(COLUMNS)))
+
+    def frame(self):
+        # Close the frame in progress, if any, and start the next one
+        now = perf_counter_ns()
+        if self._frame_start is not None:
+            current = self._current
+            current[-1] = now - self._frame_start
+            self.samples[:, self.index] = current
+            self.index = (self.index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.frames += 1
+            for i in range(len(current)):
+                current[i] = 0
+        self._frame_start = self._last = now
+
+    def lap(self, phase):
+        # Charge the time since the previous lap to phase
+        now = perf_counter_ns()
+        self._current[phase] += now - self._last
+        self._last = now
+
+    def stats(self):
+        # (3, len(COLUMNS)) array of p50, p95 and max in milliseconds over the
+        # buffered frames. The returned array is reused by the next call.
+        n = self.count
+        if n == 0:
+            self._stats.fill(0.0)
+            return self._stats
+        ordered = self._sorted[:, :n]
+        np.copyto(ordered, self.samples[:, :n])
+        ordered.sort(axis=1)
+        for row, percentile in enumerate(PERCENTILES):
+            # Nearest-rank percentile
+            rank = max(math.ceil(percentile / 100 * n) - 1, 0)
+            np.multiply(ordered[:, rank], 1e-6, out=self._stats[row])
+        return self._stats
+
+    def history(self):
+        # (frames, len(COLUMNS)) copy of the buffered frames in chronological
+        # order, in nanoseconds
+        if self.count < self.capacity:
+            return self.samples[:, :self.count].T.copy()
+        return np.roll(self.samples, -self.index, axis=1).T.copy()
+
+    def summary(self):
+        stats = self.stats()
+        return {
+            column: {f"p{p}" if p < 100 else "max": float(stats[row, i]) for row, p in enumerate(PERCENTILES)}
+            for i, column in enumerate(COLUMNS)
+        }
+
+    def dump(self, path):
+        # .json gets the summary (ms) and the raw frames (ns); anything else is
+        # written as CSV with one frame per row in nanoseconds
+        history = self.history()
+        if str(path).endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({
+                    "columns": list(COLUMNS),
+                    "unit": "ns",
+                    "frames_total": self.frames,
+                    "summary_ms": self.summary(),
+                    "frames": history.tolist(),
+                }, f, indent=1)
+        else:
+            np.savetxt(path, history, fmt="%d", delimiter=",", header=",".join(COLUMNS), comments="")
@@ -0,0 +1,119 @@
+import os
+import struct
+
+import numpy as np
+
+# Compact binary trajectory logs. A file is a fixed 64-byte header followed by
+# one row of FIELDS per simulation step, stored as float32 or float64. Rows are
+# staged in a preallocated in-memory chunk and written a chunk at a time, and
+# TrajectoryLog memory-maps the rows so any frame is an O(1) lookup without
+# loading the file.
+
+FIELDS = ("t", "x", "y", "theta", "q1", "q2", "q3", "vx", "vy", "omega")
+MAGIC = b"AXETRAJ\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIQd")  # magic, version, itemsize, fields, reserved, frames, dt
+HEADER_SIZE = 64
+
+
+class TrajectoryRecorder:
+    def __init__(self, path, dt=0.0, dtype=np.float64, chunk_size=65536):
+        self.path = path
+        self.dt = dt  # Nominal step; 0 if steps are not uniform
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+            raise ValueError(f"dtype must be float32 or float64, got {self.dtype}")
+        self.frames = 0
+        self._buffer = np.empty((chunk_size, len(FIELDS)), dtype=self.dtype)
+        self._fill = 0
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, t, x, y, theta, q1, q2, q3, vx, vy, omega):
+        if self._fill == len(self._buffer):
+            self.flush()
+        self._buffer[self._fill] = (t, x, y, theta, q1, q2, q3, vx, vy, omega)
+        self._fill += 1
+
+    def reserve(self, rows):
+        # Zero-copy path for batch producers: returns a view of up to `rows`
+        # free buffer rows to fill in place, followed by commit(len(view))
+        if self._fill == len(self._buffer):
+            self.flush()
+        return self._buffer[self._fill:self._fill + rows]
+
+    def commit(self, rows):
+        self._fill += rows
+
+    def flush(self):
+        if self._fill:
+            self._file.write(self._buffer[:self._fill].tobytes())
+            self.frames += self._fill
+            self._fill = 0
+            self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._write_header()
+        self._file.close()
+
+    def _write_header(self):
+        self._file.seek(0)
+        header = HEADER.pack(MAGIC, VERSION, self.dtype.itemsize, len(FIELDS), 0, self.frames, self.dt)
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._file.seek(0, os.SEEK_END)
+
+
+class TrajectoryLog:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, itemsize, fields, _, frames, dt = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a trajectory log")
+        if version != VERSION or fields != len(FIELDS):
+            raise ValueError(f"{path} has unsupported log version {version} with {fields} fields")
+
+        self.path = path
+        self.dtype = np.dtype(np.float32 if itemsize == 4 else np.float64)
+        self.dt = dt
+        # A recorder that never reached close() leaves frames at 0; fall back
+        # to the number of complete rows actually on disk
+        row_bytes = itemsize * len(FIELDS)
+        on_disk = (os.path.getsize(path) - HEADER_SIZE) // row_bytes
+        self.frames = min(frames, on_disk) if frames else on_disk
+        if self.frames:
+            self.data = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_SIZE,
+                                  shape=(self.frames, len(FIELDS)))
+        else:
+            self.data = np.empty((0, len(FIELDS)), dtype=self.dtype)
+
+    def __len__(self):
+        return self.frames
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def column(self, name):
+        return self.data[:, FIELDS.index(name)]
+
+    def frame(self, index):
+        return dict(zip(FIELDS, self.data[index].tolist()))
+
+    def index_at(self, t):
+        # Frame index for simulated time t: arithmetic when the step is uniform,
+        # otherwise a binary search over the t column
+        if not self.frames:
+            raise IndexError("trajectory log is empty")
+        if self.dt > 0:
+            index = round((t - float(self.data[0, 0])) / self.dt)
+        else:
+            index = int(np.searchsorted(self.data[:, 0], t))
+        return min(max(index, 0), self.frames - 1)
@@ -0,0 +1,42 @@
+import pygame
+
+# Dirty-rectangle presentation. Instead of filling and flipping the whole
+# window every frame, only the areas drawn last frame are erased and only the
+# union of last frame's and this frame's areas is pushed to the display.
+
+
+class DirtyRectRenderer:
+    def __init__(self, background):
+        # background is either a fill color or a Surface the size of the screen
+        self.background = background
+        self._previous_rects = []
+        self._full_redraw = True
+
+    def invalidate(self):
+        # Force a full repaint on the next frame, e.g. after the window was exposed
+        self._full_redraw = True
+
+    def erase(self, screen):
+        if self._full_redraw:
+            self._paint(screen, None)
+        else:
+            for rect in self._previous_rects:
+                self._paint(screen, rect)
+
+    def present(self, rects):
+        # rects are the areas drawn this frame
+        if self._full_redraw:
+            pygame.display.flip()
+            self._full_redraw = False
+        else:
+            pygame.display.update(self._previous_rects + rects)
+        self._previous_rects = rects
+
+    def _paint(self, screen, rect):
+        if isinstance(self.background, pygame.Surface):
+            if rect is None:
+                screen.blit(self.background, (0, 0))
+            else:
+                screen.blit(self.background, rect, rect)
+        else:
+            screen.fill(self.background, rect)
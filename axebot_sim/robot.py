@@ -0,0 +1,139 @@
+import numpy as np
+
+from .integrators import POSITION_SCALE
+from .kinematics import kinematics_coefficients, make_forward_kinematics, make_fused_kinematics, transformation_matrix
+from .spatial import collision_radii
+
+
+class Robot:
+    def __init__(self, position, orientation, L, wheel_angles, color, sprite_resolution=1.0, hud_rate=None,
+                 matrix_offset=0, wheel_style="sprites", hud=True, obstacles=None, sensor=None):
+        self.position = np.array(position, dtype=float)
+        self.orientation = orientation  # radians
+        self.L = L  # Distance from center to each wheel
+        self.wheel_angles = np.radians(wheel_angles)
+        # Degrees added to every wheel angle in the transformation matrix only,
+        # as the early scripts did (see presets.py)
+        self.matrix_offset = matrix_offset
+        self.color = color
+        self.obstacles = obstacles  # Optional static ObstacleMap the robot can't enter
+        self.sensor = sensor  # Optional RangeSensor; sense() stores its latest reading in ranges
+        self.ranges = None
+        # Drawing options, used by the pygame view created on first draw
+        self.wheel_style = wheel_style
+        self.sprite_resolution = sprite_resolution  # Degrees per pre-rotated wheel sprite
+        self.hud = hud
+        self.hud_rate = hud_rate  # Optional HUD refresh rate in Hz, e.g. 10
+        self._view = None
+
+    # The matrix and its inverse only depend on L, wheel_angles and
+    # matrix_offset, so they are cached and rebuilt only when one of those is
+    # reassigned
+    @property
+    def L(self):
+        return self._L
+
+    @L.setter
+    def L(self, value):
+        self._L = value
+        self._T = None
+        self.radius = float(collision_radii(value))  # Collision circle against obstacles
+
+    @property
+    def wheel_angles(self):
+        return self._wheel_angles
+
+    @wheel_angles.setter
+    def wheel_angles(self, value):
+        # Read-only so in-place edits can't silently bypass the cache
+        self._wheel_angles = np.array(value, dtype=float)
+        self._wheel_angles.setflags(write=False)
+        self._T = None
+
+    @property
+    def matrix_offset(self):
+        return self._matrix_offset
+
+    @matrix_offset.setter
+    def matrix_offset(self, value):
+        self._matrix_offset = value
+        self._T = None
+
+    def get_transformation_matrix(self):
+        if self._T is None:
+            T = transformation_matrix(self.L, self.wheel_angles + np.radians(self.matrix_offset))
+            T_inv = np.linalg.inv(T)
+            T.setflags(write=False)
+            T_inv.setflags(write=False)
+            self._T, self._T_inv = T, T_inv
+            self._coefficients = kinematics_coefficients(T, T_inv)
+            self._fused_kinematics = make_fused_kinematics(self._coefficients)
+            self._forward_kinematics = make_forward_kinematics(self._coefficients)
+        return self._T
+
+    def get_inverse_transformation_matrix(self):
+        self.get_transformation_matrix()
+        return self._T_inv
+
+    def get_kinematics_coefficients(self):
+        self.get_transformation_matrix()
+        return self._coefficients
+
+    def fused_kinematics(self, vx, vy, omega):
+        # Scalar fast path: returns (q1, q2, q3, vx, vy, omega) as plain floats
+        self.get_transformation_matrix()
+        return self._fused_kinematics(vx, vy, omega)
+
+    def forward_kinematics(self, q1, q2, q3):
+        # Scalar calculate_robot_velocity: returns (vx, vy, omega) as plain floats
+        self.get_transformation_matrix()
+        return self._forward_kinematics(q1, q2, q3)
+
+    def calculate_wheel_speeds(self, vx, vy, omega):
+        V = np.array([vx, vy, omega])
+        return self.get_inverse_transformation_matrix() @ V
+
+    def calculate_robot_velocity(self, q1, q2, q3):
+        wheel_speeds = np.array([q1, q2, q3])
+        return self.get_transformation_matrix() @ wheel_speeds
+
+    def update(self, vx, vy, omega, dt):
+        self.position += np.array([vx, vy]) * dt * POSITION_SCALE
+        self.orientation += omega * dt
+        if self.obstacles is not None:
+            self.constrain()
+
+    def constrain(self):
+        # Push the robot back out of any obstacle it moved into. The clearance
+        # at its cell is one array lookup; only when that is within a cell of
+        # contact is the interpolated distance and normal evaluated.
+        obstacles = self.obstacles
+        if obstacles is None:
+            return False
+        if obstacles.clearance(self.position[0], self.position[1]) >= self.radius + obstacles.cell_size:
+            return False
+        return obstacles.push_out(self.position, self.radius) > 0
+
+    def sense(self):
+        # Scan the obstacle map with the mounted sensor from the current pose
+        self.ranges = self.sensor.scan(self.position, self.orientation, self.obstacles)[0]
+        return self.ranges
+
+    def view(self):
+        # The pygame side of the robot, imported on first use
+        if self._view is None:
+            from .frontend import RobotView
+            self._view = RobotView(self, self.wheel_style, self.sprite_resolution, self.hud, self.hud_rate)
+        return self._view
+
+    def draw(self, screen, position=None, orientation=None):
+        # position/orientation override the robot's own pose, e.g. to draw a
+        # pose interpolated between two physics steps. Returns the drawn rects.
+        if position is None:
+            position = self.position
+        if orientation is None:
+            orientation = self.orientation
+        return self.view().draw(screen, position, orientation)
+
+    def render_status(self, screen, q1, q2, q3):
+        return self.view().render_status(screen, q1, q2, q3)
@@ -0,0 +1,172 @@
+import numpy as np
+
+from .spatial import SpatialHashGrid
+
+# Simulated range sensors. A RangeSensor is a set of rays fixed to the robot
+# body, in the same frame as wheel_angles (angle 0 points along the robot's
+# orientation). Rays of every robot are cast together: against the obstacle
+# map with a batched grid traversal, and against other robots' collision
+# circles with a batched ray-circle test, so a scan of thousands of rays is a
+# fixed number of NumPy operations rather than a Python loop per ray.
+
+# Grid traversal: a ray whose cell is more than this many cells from the
+# nearest wall jumps ahead by the clearance (the field is measured between
+# cell centers, and the ray can be anywhere inside its cell), otherwise it
+# steps to the next cell boundary like a DDA
+_SAFE_MARGIN = 1.0
+_EPSILON = 1e-7  # Nudge past a cell boundary, in cells
+
+
+class RangeSensor:
+    def __init__(self, angles, max_range=300.0, mount_angles=None, mount_radius=0.0):
+        # angles: ray directions in degrees relative to the body. Each ray
+        # starts mount_radius from the robot center at its mount angle, which
+        # defaults to its own direction.
+        self.angles = np.radians(np.asarray(angles, dtype=float).ravel())
+        self.mount_angles = self.angles if mount_angles is None else np.radians(
+            np.broadcast_to(mount_angles, self.angles.shape).astype(float))
+        self.max_range = float(max_range)
+        self.mount_radius = float(mount_radius)
+        # Ray angles sorted in [0, 2 pi) and repeated one turn up, so the rays
+        # inside any angular window are one contiguous run
+        wrapped = np.mod(self.angles, 2 * np.pi)
+        self._order = np.argsort(wrapped)
+        self._sorted_angles = np.concatenate([wrapped[self._order], wrapped[self._order] + 2 * np.pi])
+        # Index of the sensing robots with cells about half the sensing reach;
+        # a collision grid's cells are far too small for range queries
+        self._grid = None
+
+    @classmethod
+    def lidar(cls, count=360, max_range=300.0, fov=360.0, mount_radius=0.0):
+        # A fan of count rays over fov degrees, centered on the body's 0 angle
+        if fov >= 360:
+            angles = np.arange(count) * (360.0 / count)
+        else:
+            angles = np.linspace(-fov / 2, fov / 2, count)
+        return cls(angles, max_range, mount_radius=mount_radius)
+
+    @classmethod
+    def ir(cls, mount_angles, max_range=100.0, mount_radius=25.0):
+        # One ray pointing straight out of each mount, e.g. at the wheel_angles
+        return cls(mount_angles, max_range, mount_radius=mount_radius)
+
+    def __len__(self):
+        return len(self.angles)
+
+    def rays(self, positions, orientations):
+        # World-frame (N * K, 2) origins and unit directions, robot-major
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        orientations = np.asarray(orientations, dtype=float).reshape(-1, 1)
+        heading = orientations + self.angles
+        directions = np.stack([np.cos(heading), np.sin(heading)], axis=-1).reshape(-1, 2)
+        origins = np.repeat(positions, len(self.angles), axis=0)
+        if self.mount_radius:
+            mount = orientations + self.mount_angles
+            origins += self.mount_radius * np.stack([np.cos(mount), np.sin(mount)], axis=-1).reshape(-1, 2)
+        return origins, directions
+
+    def scan(self, positions, orientations, obstacles=None, radii=None):
+        # (N, K) distance along each ray to the first obstacle or other robot,
+        # max_range where nothing is hit. With radii, the robots themselves
+        # are circles of those radii at positions that the rays can hit.
+        origins, directions = self.rays(positions, orientations)
+        ranges = np.full(len(origins), self.max_range)
+        if obstacles is not None:
+            ranges = cast_grid(obstacles, origins, directions, self.max_range)
+        if radii is not None and len(ranges):
+            self._cast_robots(ranges, origins, directions, positions, orientations, radii)
+        return ranges.reshape(-1, len(self.angles))
+
+    def endpoints(self, positions, orientations, ranges):
+        # (N * K, 2) origins and hit points, e.g. for drawing
+        origins, directions = self.rays(positions, orientations)
+        return origins, origins + directions * np.asarray(ranges).reshape(-1, 1)
+
+    def _cast_robots(self, ranges, origins, directions, positions, orientations, radii):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        orientations = np.broadcast_to(np.asarray(orientations, dtype=float).ravel(), (len(positions),))
+        radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(positions),))
+        count = len(self.angles)
+        # Pairs of (sensing robot, other robot) close enough for a ray to reach
+        reach = self.max_range + self.mount_radius + float(radii.max())
+        if self._grid is None or self._grid.cell_size != reach / 2:
+            self._grid = SpatialHashGrid(reach / 2)
+        self._grid.update(positions)
+        sensing, other = self._grid.query_radius(positions, reach)
+        delta = positions[other] - positions[sensing]
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        extent = radii[other] + self.mount_radius
+        # Robots beyond the sensing robot's longest ray so far (walls already
+        # cut most rays short) can't be seen
+        longest = ranges.reshape(-1, count).max(axis=1)
+        keep = (sensing != other) & (distance - extent < longest[sensing])
+        sensing, other, delta, distance, extent = sensing[keep], other[keep], delta[keep], distance[keep], extent[keep]
+        if not len(sensing):
+            return
+
+        # Only rays pointing into the cone the other robot covers as seen from
+        # the sensing robot's center, widened by the mount radius since rays
+        # start off-center, can hit it
+        half_width = np.arcsin(np.minimum(extent / np.maximum(distance, 1e-12), 1.0))
+        half_width[distance <= extent] = np.pi
+        bearing = np.arctan2(delta[:, 1], delta[:, 0]) - orientations[sensing]
+        low = np.mod(bearing - half_width, 2 * np.pi)
+        start = np.searchsorted(self._sorted_angles, low, side="left")
+        stop = np.searchsorted(self._sorted_angles, low + 2 * half_width, side="right")
+        counts = np.minimum(stop - start, count)
+        total = int(counts.sum())
+        if total == 0:
+            return
+        # Expand each pair's run of sorted rays without a Python loop
+        run = np.arange(total) + np.repeat(start - (np.cumsum(counts) - counts), counts)
+        ray = np.repeat(sensing * count, counts) + self._order[run % count]
+        other = np.repeat(other, counts)
+        hits = ray_circle(origins[ray], directions[ray], positions[other], radii[other])
+        np.minimum.at(ranges, ray, np.minimum(hits, self.max_range))
+
+
+def ray_circle(origins, directions, centers, radii):
+    # Distance along unit directions to the first crossing into each circle;
+    # inf where the ray misses, points away or starts inside the circle
+    offset = origins - centers
+    b = np.einsum("ij,ij->i", offset, directions)
+    c = np.einsum("ij,ij->i", offset, offset) - radii * radii
+    discriminant = b * b - c
+    t = -b - np.sqrt(np.maximum(discriminant, 0))
+    return np.where((discriminant >= 0) & (c > 0) & (t >= 0), t, np.inf)
+
+
+def cast_grid(obstacles, origins, directions, max_range):
+    # Distance along each ray to the first occupied cell of an ObstacleMap,
+    # max_range if there is none within reach. Works in cell units; all rays
+    # advance together and finished ones drop out of the batch.
+    cell_size = obstacles.cell_size
+    ranges = np.full(len(origins), float(max_range))
+    o = origins / cell_size
+    d = np.where(np.abs(directions) < 1e-12, 1e-12, directions)  # No division by zero below
+    inverse = 1.0 / d
+    # Clip each ray to the map rectangle; outside it there is nothing to hit
+    bounds = np.array([obstacles.cols, obstacles.rows], dtype=float)
+    near, far = -o * inverse, (bounds - o) * inverse
+    t = np.maximum(np.minimum(near, far).max(axis=1), 0.0)
+    end = np.minimum(np.maximum(near, far).min(axis=1), max_range / cell_size)
+
+    occupancy, sdf = obstacles.occupancy, obstacles.sdf
+    cols, rows = obstacles.cols, obstacles.rows
+    index = np.flatnonzero(t < end)
+    t, end, o, d, inverse = t[index], end[index], o[index], d[index], inverse[index]
+    step_up = d > 0  # Whether the next boundary on each axis is the upper one
+    while len(index):
+        p = o + d * t[:, None]
+        col = np.minimum(p[:, 0].astype(np.intp), cols - 1)
+        row = np.minimum(p[:, 1].astype(np.intp), rows - 1)
+        hit = occupancy[row, col]
+        ranges[index[hit]] = t[hit] * cell_size
+
+        clearance = sdf[row, col] / cell_size - _SAFE_MARGIN
+        boundary = (np.stack([col, row], axis=1) + step_up - o) * inverse
+        t = np.where(clearance > 1.0, t + clearance, boundary.min(axis=1) + _EPSILON)
+        live = ~hit & (t < end)
+        index, t, end, o, d, inverse, step_up = (
+            index[live], t[live], end[live], o[live], d[live], inverse[live], step_up[live])
+    return ranges
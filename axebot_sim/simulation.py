@@ -0,0 +1,524 @@
+import heapq
+import itertools
+import math
+import time
+
+import numpy as np
+
+from .commands import ConstantCommands, KeyboardCommands
+from .integrators import INTEGRATOR_FUNCTIONS, INTEGRATORS, body_to_world, constant_segments, integrate_exact, world_to_body
+from .kinematics import integrate_fused
+from .motors import WheelMotors
+from .obstacles import ObstacleMap
+from .planning import GridPlanner
+from .presets import DEFAULT_KEYMAP, get_preset
+from .profiler import EVENTS, INPUT, KINEMATICS, TICK, UPDATE, FrameProfiler
+from .recorder import TrajectoryLog, TrajectoryRecorder
+from .robot import Robot
+from .tracking import PathTracker, TrackingCommands
+
+
+class Simulation:
+    def __init__(self, width, height, headless=False, dt=0.1, fps=60, time_scale=6.0, hud_rate=None,
+                 dirty_rects=False, L=85, wheel_angles=(90, -30, -150), base_speed=0.5, max_speed_ratio=6,
+                 integrator="euler", event_driven=False, profile=False, profile_path=None, matrix_offset=0,
+                 keymap=DEFAULT_KEYMAP, wheel_style="sprites", hud=True, obstacles=None, sensor=None,
+                 motors=None):
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"integrator must be one of {INTEGRATORS}, got {integrator!r}")
+        self.width = width
+        self.height = height
+        self.headless = headless
+        self.running = True
+        self.FPS = fps  # Render rate
+        self.dt = dt  # Physics time step in seconds, independent of FPS
+        self.time = 0.0  # Simulated time in seconds
+        # Pose integration scheme, see integrators.py. "exact" also lets step()
+        # cross each constant-command segment in a single jump.
+        self.integrator = integrator
+        # Simulated seconds per wall-clock second. 6.0 matches the original
+        # pacing of one 0.1 s step per frame at 60 FPS.
+        self.time_scale = time_scale
+        # Wall-clock time simulated per frame at most, so a stalled frame is
+        # dropped instead of triggering an ever-growing burst of catch-up steps
+        self.max_frame_time = 0.25
+        # Event-driven mode: while the robot is idle, skip physics in bulk, stop
+        # redrawing and sleep until input, a command change or a scheduled event
+        self.event_driven = event_driven
+        self.needs_redraw = True
+        self._events = []  # Heap of (time, sequence, callback)
+        self._event_ids = itertools.count()
+        # Opt-in per-phase frame timings for run(), shown as an overlay (F3
+        # toggles it) and written to profile_path (.csv or .json) on exit
+        self.profiler = FrameProfiler() if profile else None
+        self.profile_path = profile_path
+        # Static obstacles: an ObstacleMap or a file for ObstacleMap.load
+        if obstacles is not None and not isinstance(obstacles, ObstacleMap):
+            obstacles = ObstacleMap.load(obstacles)
+        self.obstacles = obstacles
+        self.planner = None  # GridPlanner for navigate(), made on first use
+        self.robot = Robot(
+            position=[width // 2, height // 2],
+            orientation=0,
+            L=L,
+            wheel_angles=list(wheel_angles),
+            color=(100, 150, 255),
+            hud_rate=hud_rate,
+            matrix_offset=matrix_offset,
+            wheel_style=wheel_style,
+            hud=hud,
+            obstacles=obstacles,
+            sensor=sensor  # Optional RangeSensor, read once per rendered frame by run()
+        )
+        # Optional wheel motor model: a WheelMotors, or a dict of its parameters.
+        # Without it wheels reach their commanded speeds instantly.
+        if isinstance(motors, dict):
+            motors = WheelMotors(1, **motors)
+        self.motors = motors
+        self.BASE_SPEED = base_speed
+        self.MAX_SPEED_RATIO = max_speed_ratio
+        self.wheel_speeds = (0.0, 0.0, 0.0)
+        self.steps = 0  # Physics steps taken; command sources are indexed by it
+        self.recorder = None
+        self.keyboard = KeyboardCommands(self.BASE_SPEED, self.MAX_SPEED_RATIO, keymap)
+        # Live keyboard by default; headless runs hold still until given a source
+        self.command_source = ConstantCommands() if headless else self.keyboard
+        # The pygame window, created only for interactive runs
+        self.frontend = None
+        if not headless:
+            from .frontend import PygameFrontend
+            self.frontend = PygameFrontend(self, width, height, dirty_rects=dirty_rects)
+
+    @classmethod
+    def from_preset(cls, name, **overrides):
+        # Simulation configured like one of the original scripts, see presets.py
+        return cls(**get_preset(name, **overrides))
+
+    def set_command_source(self, source):
+        self.command_source = source
+
+    def navigate(self, goal, **tracker_options):
+        # Plan a path from the robot to goal around the obstacles and follow
+        # it; tracker_options go to PathTracker. Returns the waypoints, or
+        # None (leaving the command source alone) if goal can't be reached.
+        robot = self.robot
+        if self.obstacles is None:
+            path = np.array([robot.position, goal], dtype=float)
+        else:
+            if self.planner is None or self.planner.obstacles is not self.obstacles:
+                self.planner = GridPlanner(self.obstacles, radius=robot.radius)
+            path = self.planner.plan(robot.position, goal)
+            if path is None:
+                return None
+        tracker_options.setdefault("speed", self.BASE_SPEED)
+        self.set_command_source(TrackingCommands(PathTracker([path], **tracker_options), robot))
+        return path
+
+    def schedule(self, t, callback):
+        # Call callback(self) once simulated time reaches t
+        heapq.heappush(self._events, (t, next(self._event_ids), callback))
+
+    def is_idle(self):
+        # Wheels still spinning down under a zero command keep the robot moving
+        return not any(self.command_source.command(self.steps)) and (self.motors is None or self.motors.at_rest())
+
+    def steps_until_next_event(self, limit=math.inf):
+        # Whole steps from now until the command source may change or the next
+        # scheduled event is due, capped at limit
+        n = limit
+        change = self.command_source.next_change(self.steps)
+        if change is not None:
+            n = min(n, change - self.steps)
+        if self._events:
+            n = min(n, math.ceil((self._events[0][0] - self.time) / self.dt - 1e-9))
+        return max(n, 0)
+
+    def _fire_events(self):
+        while self._events and self._events[0][0] <= self.time + self.dt * 1e-6:
+            _, _, callback = heapq.heappop(self._events)
+            callback(self)
+            self.needs_redraw = True
+
+    def run_until(self, t_end):
+        # Event-driven batch run: step straight from one command change or
+        # scheduled event to the next. With the exact integrator each constant
+        # stretch costs one closed-form jump, and idle stretches cost nothing.
+        while True:
+            self._fire_events()
+            remaining = round((t_end - self.time) / self.dt)
+            if remaining <= 0:
+                break
+            self.step(max(1, self.steps_until_next_event(remaining)))
+        return self.robot.position.copy(), self.robot.orientation
+
+    def start_recording(self, path, dtype=np.float64, chunk_size=65536):
+        # Stream (t, x, y, theta, q1..q3, vx, vy, omega) for every physics step to path
+        self.stop_recording()
+        self.recorder = TrajectoryRecorder(path, dt=self.dt, dtype=dtype, chunk_size=chunk_size)
+        return self.recorder
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def handle_input(self):
+        return self.to_world_velocity(*self.read_input())
+
+    def read_input(self):
+        # Robot-relative (forward, sideways, omega) command from the keyboard
+        return self.keyboard.read()
+
+    def to_world_velocity(self, forward_speed, sideways_speed, desired_omega):
+        # Convert robot-relative speeds to global vx, vy based on the robot's orientation
+        cos_theta = np.cos(self.robot.orientation)
+        sin_theta = np.sin(self.robot.orientation)
+        desired_vx = -forward_speed * cos_theta + sideways_speed * sin_theta
+        desired_vy = -forward_speed * sin_theta - sideways_speed * cos_theta
+
+        return desired_vx, desired_vy, desired_omega
+
+    def advance(self, desired_vx, desired_vy, desired_omega):
+        # One physics step: inverse kinematics, forward kinematics, integration
+        profiler = self.profiler
+        q1, q2, q3, vx, vy, omega = self.robot.fused_kinematics(desired_vx, desired_vy, desired_omega)
+        if self.motors is not None:
+            q1, q2, q3 = self.motors.step_one(q1, q2, q3, self.dt)
+            vx, vy, omega = self.robot.forward_kinematics(q1, q2, q3)
+        if profiler is not None:
+            profiler.lap(KINEMATICS)
+        if self.integrator == "euler":
+            self.robot.update(vx, vy, omega, self.dt)
+        else:
+            robot = self.robot
+            forward_speed, sideways_speed = world_to_body(robot.orientation, vx, vy)
+            x, y, theta = INTEGRATOR_FUNCTIONS[self.integrator](
+                robot.position[0], robot.position[1], robot.orientation,
+                forward_speed, sideways_speed, omega, self.dt)
+            robot.position[:] = (x, y)
+            robot.orientation = float(theta)
+            robot.constrain()
+        self.time += self.dt
+        self.steps += 1
+        self.wheel_speeds = (q1, q2, q3)
+        if self.recorder is not None:
+            self.recorder.record(self.time, self.robot.position[0], self.robot.position[1], self.robot.orientation,
+                                 q1, q2, q3, vx, vy, omega)
+        if profiler is not None:
+            profiler.lap(UPDATE)
+        return q1, q2, q3
+
+    def step(self, n=1, controls=None, trajectory=None):
+        # Advance n physics steps without polling input, drawing or frame pacing.
+        # controls is either a single (forward, sideways, omega) command held for
+        # all n steps, or an (n, 3) array with one command per step. Without
+        # controls the next n commands come from the command source. An optional
+        # (n, 9) trajectory array receives x, y, theta, q1..q3, vx, vy, omega per step.
+        if controls is None:
+            if self.command_source.feedback:
+                return self._step_each(None, trajectory, n)
+            controls = self.command_source.block(self.steps, n)
+        controls = np.asarray(controls, dtype=float)
+        if controls.ndim == 1:
+            controls = np.broadcast_to(controls, (n, 3))
+        elif controls.shape != (n, 3):
+            raise ValueError(f"controls must have shape (3,) or ({n}, 3), got {controls.shape}")
+
+        motors = self.motors
+        if not controls.any() and (motors is None or motors.at_rest()):
+            return self._skip_idle(n, trajectory)
+
+        if self.obstacles is not None or (motors is not None and self.integrator != "euler"):
+            return self._step_each(controls, trajectory)
+
+        if self.integrator != "euler":
+            return self._step_segments(controls, trajectory)
+
+        # The whole batch runs inside one fused kernel call (Numba-compiled when
+        # available), with the motor model folded in if there is one
+        robot = self.robot
+        pose = np.array([robot.position[0], robot.position[1], robot.orientation])
+        wheel_speeds = np.array(self.wheel_speeds, dtype=float)
+        coefficients = robot.get_kinematics_coefficients()
+        motor_state = motors.kernel_state(self.dt) if motors is not None else None
+        if self.recorder is None:
+            integrate_fused(coefficients, pose, controls, self.dt, wheel_speeds, trajectory, motor_state)
+        else:
+            # Let the kernel write its per-step state straight into the recorder's chunk buffer
+            done = 0
+            while done < n:
+                block = self.recorder.reserve(n - done)
+                rows = len(block)
+                integrate_fused(coefficients, pose, controls[done:done + rows], self.dt, wheel_speeds, block[:, 1:],
+                                motor_state)
+                self._commit_recorded(block, done)
+                if trajectory is not None:
+                    trajectory[done:done + rows] = block[:, 1:]
+                done += rows
+        robot.position[:] = pose[:2]
+        robot.orientation = float(pose[2])
+        self.time += n * self.dt
+        self.steps += n
+        self.wheel_speeds = tuple(wheel_speeds.tolist())
+
+        return self.wheel_speeds
+
+    def _step_each(self, controls, trajectory, n=None):
+        # With obstacles every step may end in a contact that changes the pose,
+        # the RK4/exact batches have no motor model, and feedback command
+        # sources (controls=None) need the pose before each command, so the
+        # batch kernels don't apply and each step goes through advance()
+        robot = self.robot
+        for k in range(len(controls) if controls is not None else n):
+            command = controls[k].tolist() if controls is not None else self.command_source.command(self.steps)
+            q1, q2, q3 = self.advance(*self.to_world_velocity(*command))
+            if trajectory is not None:
+                vx, vy, omega = robot.forward_kinematics(q1, q2, q3)
+                trajectory[k] = (robot.position[0], robot.position[1], robot.orientation, q1, q2, q3, vx, vy, omega)
+        return self.wheel_speeds
+
+    def _step_segments(self, controls, trajectory):
+        # RK4/exact batch stepping. Commands are split into constant segments;
+        # with the exact integrator and nothing to record each segment is one
+        # closed-form jump, otherwise per-step states are produced for the
+        # trajectory and recorder.
+        robot = self.robot
+        T_inv = robot.get_inverse_transformation_matrix()
+        x, y, theta = float(robot.position[0]), float(robot.position[1]), float(robot.orientation)
+        keep_states = trajectory is not None or self.recorder is not None
+        integrate = INTEGRATOR_FUNCTIONS[self.integrator]
+        last_heading = theta  # Heading at the start of the last step, for the reported wheel speeds
+
+        for start, stop in constant_segments(controls):
+            forward_speed, sideways_speed, desired_omega = controls[start].tolist()
+            steps = stop - start
+            start_heading = theta
+            if self.integrator == "exact" and not keep_states:
+                x, y, theta = (float(v) for v in integrate_exact(
+                    x, y, theta, forward_speed, sideways_speed, desired_omega, steps * self.dt))
+                last_heading = theta - desired_omega * self.dt
+                continue
+
+            if self.integrator == "exact":
+                xs, ys, thetas = integrate_exact(x, y, theta, forward_speed, sideways_speed, desired_omega,
+                                                 self.dt * np.arange(1, steps + 1))
+            else:
+                xs, ys, thetas = np.empty(steps), np.empty(steps), np.empty(steps)
+                for k in range(steps):
+                    x, y, theta = integrate(x, y, theta, forward_speed, sideways_speed, desired_omega, self.dt)
+                    xs[k], ys[k], thetas[k] = x, y, theta
+
+            # Wheel speeds and world velocities as commanded at the start of each step
+            headings = np.concatenate([[start_heading], thetas[:-1]])
+            vxs, vys = body_to_world(headings, forward_speed, sideways_speed)
+            states = np.empty((steps, 9))
+            states[:, 0], states[:, 1], states[:, 2] = xs, ys, thetas
+            states[:, 3:6] = (T_inv @ np.vstack([vxs, vys, np.full(steps, desired_omega)])).T
+            states[:, 6], states[:, 7], states[:, 8] = vxs, vys, desired_omega
+            if trajectory is not None:
+                trajectory[start:stop] = states
+            if self.recorder is not None:
+                done = 0
+                while done < steps:
+                    block = self.recorder.reserve(steps - done)
+                    block[:, 1:] = states[done:done + len(block)]
+                    self._commit_recorded(block, start + done)
+                    done += len(block)
+            x, y, theta = float(xs[-1]), float(ys[-1]), float(thetas[-1])
+            last_heading = float(headings[-1])
+
+        if len(controls):
+            forward_speed, sideways_speed, desired_omega = controls[-1].tolist()
+            self.wheel_speeds = tuple((T_inv @ np.array([*body_to_world(last_heading, forward_speed, sideways_speed),
+                                                         desired_omega])).tolist())
+        robot.position[:] = (x, y)
+        robot.orientation = theta
+        self.time += len(controls) * self.dt
+        self.steps += len(controls)
+        return self.wheel_speeds
+
+    def _skip_idle(self, n, trajectory=None):
+        # Zero command: the pose stays put and only the clock moves, so there is
+        # nothing to integrate. Recorded rows are still written to keep logs uniform.
+        state = (self.robot.position[0], self.robot.position[1], self.robot.orientation, 0, 0, 0, 0, 0, 0)
+        if trajectory is not None:
+            trajectory[:n] = state
+        if self.recorder is not None:
+            done = 0
+            while done < n:
+                block = self.recorder.reserve(n - done)
+                block[:, 1:] = state
+                self._commit_recorded(block, done)
+                done += len(block)
+        if self.motors is not None:
+            self.motors.reset()  # At rest, see WheelMotors.at_rest()
+        self.time += n * self.dt
+        self.steps += n
+        self.wheel_speeds = (0.0, 0.0, 0.0)
+        return self.wheel_speeds
+
+    def _commit_recorded(self, block, offset):
+        # Fill the time column of a recorder block holding steps offset.. of the current batch
+        block[:, 0] = self.time + self.dt * np.arange(offset + 1, offset + len(block) + 1)
+        self.recorder.commit(len(block))
+
+    def run_headless(self, controls=None, steps=None):
+        # Headless counterpart of run(): integrate the whole control sequence
+        # (or the command source's remaining steps) as fast as the CPU allows
+        # and return the final pose
+        if controls is not None:
+            controls = np.asarray(controls, dtype=float)
+            if steps is None:
+                steps = len(controls) if controls.ndim == 2 else 1
+        elif steps is None:
+            if self.command_source.steps is None:
+                raise ValueError("steps is required for an unbounded command source")
+            steps = max(0, self.command_source.steps - self.steps)
+        self.step(steps, controls)
+        return self.robot.position.copy(), self.robot.orientation
+
+    def run(self):
+        if self.headless:
+            raise RuntimeError("Simulation was created headless; use step() or run_headless()")
+
+        # Fixed-timestep loop: wall-clock frame time fills an accumulator that is
+        # drained in whole physics steps of self.dt, so simulated time no longer
+        # depends on the frame rate. The leftover fraction interpolates the
+        # drawn pose between the last two physics states.
+        accumulator = 0.0
+        previous_position = self.robot.position.copy()
+        previous_orientation = self.robot.orientation
+        profiler = self.profiler
+        frontend = self.frontend
+        frontend.reset_clock()
+
+        while self.running:
+            if profiler is not None:
+                profiler.frame()
+            frame_time = min(frontend.tick(self.FPS), self.max_frame_time)
+            accumulator += frame_time * self.time_scale
+            if profiler is not None:
+                profiler.lap(TICK)
+
+            frontend.poll_events()
+            if profiler is not None:
+                profiler.lap(EVENTS)
+
+            # Live sources (the keyboard) sample once per frame; scripted ones
+            # are indexed per physics step so runs replay exactly
+            self.command_source.poll()
+            if profiler is not None:
+                profiler.lap(INPUT)
+            if self.event_driven and self.is_idle():
+                accumulator = self._idle_frame(accumulator)
+                previous_position[:] = self.robot.position
+                previous_orientation = self.robot.orientation
+                continue
+
+            self.needs_redraw = True
+            while accumulator >= self.dt:
+                if self._events:
+                    self._fire_events()
+                previous_position[:] = self.robot.position
+                previous_orientation = self.robot.orientation
+                command = self.to_world_velocity(*self.command_source.command(self.steps))
+                if profiler is not None:
+                    profiler.lap(INPUT)
+                self.advance(*command)
+                accumulator -= self.dt
+
+            if self.robot.sensor is not None:
+                self.robot.sense()
+                if profiler is not None:
+                    profiler.lap(UPDATE)
+            alpha = accumulator / self.dt
+            position = previous_position + (self.robot.position - previous_position) * alpha
+            orientation = previous_orientation + (self.robot.orientation - previous_orientation) * alpha
+            frontend.render(position, orientation)
+
+        self.stop_recording()
+        self._finish_profile()
+        frontend.close()
+
+    def replay(self, path):
+        # Play a recorded log back at time_scale. Frames are looked up by
+        # simulated time in the memory-mapped log, so seeking is O(1).
+        if self.headless:
+            raise RuntimeError("Simulation was created headless; open the log with TrajectoryLog instead")
+
+        log = TrajectoryLog(path)
+        t = float(log[0][0]) if len(log) else 0.0
+        profiler = self.profiler
+        frontend = self.frontend
+        frontend.reset_clock()
+
+        while self.running and len(log):
+            if profiler is not None:
+                profiler.frame()
+            t += min(frontend.tick(self.FPS), self.max_frame_time) * self.time_scale
+            if profiler is not None:
+                profiler.lap(TICK)
+            frontend.poll_events()
+            if profiler is not None:
+                profiler.lap(EVENTS)
+
+            index = log.index_at(t)
+            _, x, y, theta, q1, q2, q3 = log[index][:7].tolist()
+            self.robot.position[:] = (x, y)
+            self.robot.orientation = theta
+            self.wheel_speeds = (q1, q2, q3)
+            frontend.render(self.robot.position, theta)
+
+            if index == len(log) - 1:
+                self.running = False
+
+        self._finish_profile()
+        frontend.close()
+
+    def _finish_profile(self):
+        # Close the last profiled frame and write the timings out
+        if self.profiler is not None:
+            self.profiler.frame()
+            if self.profile_path is not None:
+                self.profiler.dump(self.profile_path)
+
+    def _idle_frame(self, accumulator):
+        # Skip the idle steps this frame covers in one go, draw only if something
+        # changed, then sleep until there is something to do
+        accumulator = self._skip_idle_time(accumulator)
+        if not self.running:
+            return accumulator
+        if self.needs_redraw:
+            self.frontend.render(self.robot.position, self.robot.orientation)
+            self.needs_redraw = False
+        if not self.is_idle():
+            # A scheduled event changed the command; resume normal frames
+            return accumulator
+
+        accumulator += self._wait_for_activity(accumulator) * self.time_scale
+        self.frontend.reset_clock()
+        # The robot stayed idle while sleeping, so the slept time is skipped too
+        return self._skip_idle_time(accumulator)
+
+    def _skip_idle_time(self, accumulator):
+        self._fire_events()
+        skip = self.steps_until_next_event(int(accumulator // self.dt))
+        if skip:
+            self._skip_idle(skip)
+        if self.profiler is not None:
+            self.profiler.lap(UPDATE)
+        return accumulator - skip * self.dt
+
+    def _wait_for_activity(self, accumulator):
+        # Block until an input event arrives or simulated time reaches the next
+        # command change or scheduled event. Returns the wall-clock seconds slept.
+        steps = self.steps_until_next_event()
+        if steps == 0:
+            return 0.0
+        start = time.perf_counter()
+        if math.isinf(steps):
+            self.frontend.wait()
+        else:
+            wall_seconds = (steps * self.dt - accumulator) / self.time_scale
+            self.frontend.wait(max(1, int(wall_seconds * 1000)))
+        return time.perf_counter() - start
@@ -0,0 +1,156 @@
+import numpy as np
+
+# Uniform-grid spatial index over an (N, 2) position array, e.g.
+# RobotFleet.positions. Each robot's cell is packed into one int64 key and the
+# robots are kept sorted by key, so the robots of any cell are one contiguous
+# slice found by binary search and every query is a handful of batched NumPy
+# operations instead of an O(N^2) all-pairs test.
+#
+# update() re-sorts starting from the previous order with a stable sort, which
+# is close to linear when only a few robots changed cells since the last step,
+# and skips the sort entirely when none did.
+
+BODY_RADIUS = 20  # Robot body circle, as drawn
+WHEEL_MARGIN = 5  # Half the wheel thickness, beyond the wheel distance L
+
+# Cell coordinates are shifted positive and packed as x * _STRIDE + y
+_OFFSET = 1 << 20
+_STRIDE = 1 << 21
+
+
+def collision_radii(L, body_radius=BODY_RADIUS, wheel_margin=WHEEL_MARGIN):
+    # Per-robot collision circle: the body or the wheels, whichever reaches further
+    return np.maximum(body_radius, np.asarray(L, dtype=float) + wheel_margin)
+
+
+class SpatialHashGrid:
+    def __init__(self, cell_size):
+        # Queries are cheapest with cells about as large as the query radius
+        self.cell_size = float(cell_size)
+        self.positions = np.empty((0, 2))
+        self.order = np.empty(0, dtype=np.intp)  # Robot indices sorted by cell key
+        self.sorted_keys = np.empty(0, dtype=np.int64)
+        self.sorts = 0  # Updates that had to reorder robots
+        # Occupied cells: their keys and where their robots start in order
+        self._cell_keys = np.empty(0, dtype=np.int64)
+        self._cell_starts = np.zeros(1, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.order)
+
+    def update(self, positions):
+        # Index positions (kept by reference, not copied) for the queries below;
+        # call again after the positions change
+        self.positions = positions
+        keys = self._keys(positions)
+        if len(self.order) != len(keys):
+            self.order = np.argsort(keys, kind="stable")
+            self.sorts += 1
+        else:
+            keys_in_order = keys[self.order]
+            if len(keys) > 1 and (keys_in_order[1:] < keys_in_order[:-1]).any():
+                self.order = self.order[np.argsort(keys_in_order, kind="stable")]
+                self.sorts += 1
+        self.sorted_keys = keys[self.order]
+        starts = np.flatnonzero(np.diff(self.sorted_keys)) + 1
+        self._cell_keys = self.sorted_keys[np.concatenate([[0], starts])] if len(keys) else self.sorted_keys
+        self._cell_starts = np.concatenate([[0], starts, [len(keys)]])
+
+    def pairs(self, radius=None, radii=None):
+        # All pairs i < j closer than radius, or than radii[i] + radii[j] for
+        # per-robot radii. Returns (i, j, distance) arrays.
+        if radii is not None:
+            radii = np.asarray(radii, dtype=float)
+            reach = 2 * float(radii.max()) if len(radii) else 0.0
+        else:
+            reach = float(radius)
+        # Each unordered pair of cells is visited once: the owner's own cell,
+        # where pairs are deduplicated by index, and half of its neighbors
+        steps = self._steps(reach)
+        half = [(dx, dy) for dx in range(0, steps + 1) for dy in range(-steps, steps + 1) if (dx, dy) > (0, 0)]
+        i, j = self._candidates(self.sorted_keys, self.order, [(0, 0)])
+        keep = i < j
+        other_i, other_j = self._candidates(self.sorted_keys, self.order, half)
+        i = np.concatenate([i[keep], np.minimum(other_i, other_j)])
+        j = np.concatenate([j[keep], np.maximum(other_i, other_j)])
+        distance = np.hypot(*(self.positions[j] - self.positions[i]).T)
+        limit = radius if radii is None else radii[i] + radii[j]
+        close = distance < limit
+        return i[close], j[close], distance[close]
+
+    def query_radius(self, points, radius):
+        # Robots within radius of each point, e.g. for sensors. points is (M, 2);
+        # returns (point_index, robot_index) arrays.
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        keys = self._keys(points)
+        owners = np.argsort(keys)
+        steps = self._steps(radius)
+        offsets = [(dx, dy) for dx in range(-steps, steps + 1) for dy in range(-steps, steps + 1)]
+        p, r = self._candidates(keys[owners], owners, offsets)
+        offset = self.positions[r] - points[p]
+        inside = np.einsum("ij,ij->i", offset, offset) <= radius * radius
+        return p[inside], r[inside]
+
+    def neighbors(self, index, radius):
+        # Other robots within radius of robot index
+        _, found = self.query_radius(self.positions[index], radius)
+        return found[found != index]
+
+    def _keys(self, points):
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        return (cells[:, 0] + _OFFSET) * _STRIDE + (cells[:, 1] + _OFFSET)
+
+    def _steps(self, reach):
+        # Cells to search in each direction to cover reach
+        return int(np.ceil(reach / self.cell_size)) if reach > 0 else 0
+
+    def _candidates(self, keys, owners, offsets):
+        # (owner, robot) pairs for every robot in the cells at the given (dx, dy)
+        # offsets from each owner's cell; keys are the owners' cell keys in
+        # ascending order. Moving to a neighboring cell adds a constant to the
+        # key, so every offset is one binary search over sorted queries, and the
+        # matching slices are expanded without a Python loop.
+        cell_keys, cell_starts = self._cell_keys, self._cell_starts
+        owner_parts, robot_parts = [], []
+        for dx, dy in offsets:
+            query = keys + (dx * _STRIDE + dy)
+            cell = np.searchsorted(cell_keys, query)
+            found = cell < len(cell_keys)
+            found[found] = cell_keys[cell[found]] == query[found]
+            cell = np.where(found, cell, 0)
+            start = cell_starts[cell]
+            counts = np.where(found, cell_starts[cell + 1] - start, 0)
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # Position within each owner's slice, shifted to the slice start
+            slice_start = np.repeat(start - (np.cumsum(counts) - counts), counts)
+            owner_parts.append(np.repeat(owners, counts))
+            robot_parts.append(self.order[np.arange(total) + slice_start])
+        if not owner_parts:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate(owner_parts), np.concatenate(robot_parts)
+
+
+def resolve_collisions(positions, radii, grid, iterations=1):
+    # Push overlapping robots apart along the line between their centers, each
+    # by half the overlap, in place. A few iterations settle crowded clusters.
+    # Returns the number of contacts found in the first iteration.
+    contacts = None
+    for _ in range(iterations):
+        grid.update(positions)
+        i, j, distance = grid.pairs(radii=radii)
+        if contacts is None:
+            contacts = len(i)
+        if len(i) == 0:
+            break
+        overlap = radii[i] + radii[j] - distance
+        delta = positions[j] - positions[i]
+        # Coincident centers get an arbitrary but deterministic direction
+        coincident = distance == 0
+        delta[coincident] = (1.0, 0.0)
+        shift = delta * (overlap / (2 * np.where(coincident, 1.0, distance)))[:, None]
+        np.subtract.at(positions, i, shift)
+        np.add.at(positions, j, shift)
+    return contacts or 0
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+import pygame
+
+# Pre-rotated sprite cache. pygame.transform.rotate allocates and rasterizes a
+# new surface on every call, so rotations are quantized to a fixed angular
+# resolution and each bin is rendered once and reused. With max_size smaller
+# than the number of bins the least recently used rotations are evicted.
+
+
+class SpriteCache:
+    def __init__(self, surface, resolution=1.0, max_size=None):
+        self.surface = surface
+        self.resolution = resolution  # Degrees per bin, e.g. 1.0 or 0.5
+        self.bins = round(360 / resolution)
+        self.max_size = self.bins if max_size is None else max_size
+        self.hits = 0
+        self.misses = 0
+        self._sprites = OrderedDict()  # bin -> (rotated surface, half width, half height)
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def prerender(self):
+        # Fill every bin up front so drawing never rotates mid-run
+        for index in range(min(self.bins, self.max_size)):
+            self._lookup(index)
+
+    def get(self, angle_degrees):
+        # Counter-clockwise rotation in degrees, same convention as pygame.transform.rotate
+        return self._lookup(round(angle_degrees / self.resolution) % self.bins)[0]
+
+    def blit(self, screen, angle_degrees, center):
+        sprite, half_width, half_height = self._lookup(round(angle_degrees / self.resolution) % self.bins)
+        return screen.blit(sprite, (center[0] - half_width, center[1] - half_height))
+
+    def _lookup(self, index):
+        entry = self._sprites.get(index)
+        if entry is not None:
+            self.hits += 1
+            self._sprites.move_to_end(index)
+            return entry
+
+        self.misses += 1
+        sprite = pygame.transform.rotate(self.surface, index * self.resolution)
+        entry = (sprite, sprite.get_width() / 2, sprite.get_height() / 2)
+        self._sprites[index] = entry
+        if len(self._sprites) > self.max_size:
+            self._sprites.popitem(last=False)
+        return entry
+
+
+_shared_caches = {}
+
+
+def get_shared_cache(name, make_surface, resolution=1.0, max_size=None):
+    # One cache per (sprite, resolution) shared by every robot that draws it
+    key = (name, resolution)
+    cache = _shared_caches.get(key)
+    if cache is None:
+        cache = _shared_caches[key] = SpriteCache(make_surface(), resolution, max_size)
+    return cache
@@ -0,0 +1,146 @@
+import inspect
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .simulation import Simulation
+
+# Parameter sweeps over chassis variants. Each variant is a dict of Simulation
+# keyword arguments (L, wheel_angles, base_speed, max_speed_ratio). Variants
+# are run headless in chunks across a process pool and the per-run metrics are
+# gathered into one columnar table: a dict of NumPy arrays, one row per variant.
+# Variants may set different parameters, e.g. a grid() plus a random_sample();
+# a parameter a variant leaves out is tabulated at its Simulation default.
+
+METRICS = ("displacement_x", "displacement_y", "final_theta", "path_length", "max_wheel_speed", "mean_wheel_speed", "elapsed")
+
+
+def grid(**axes):
+    # Cartesian product, e.g. grid(L=[50, 85], wheel_angles=[(90, -30, -150), (90, -150, -30)])
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def random_sample(n, seed=None, **ranges):
+    # Each range is a (low, high) tuple sampled uniformly or a list of choices
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, spec in ranges.items():
+        if isinstance(spec, tuple):
+            columns[name] = rng.uniform(spec[0], spec[1], n).tolist()
+        else:
+            columns[name] = [spec[i] for i in rng.integers(len(spec), size=n)]
+    return [{name: columns[name][i] for name in ranges} for i in range(n)]
+
+
+def scale_controls(controls, base_speed, max_speed_ratio):
+    # Scenario commands give linear speeds in multiples of base_speed, the way
+    # the arrow keys do, capped at the key-9 boost of max_speed_ratio
+    commands = np.array(controls, dtype=float).reshape(-1, 3)
+    limit = base_speed * max_speed_ratio
+    np.clip(commands[:, :2] * base_speed, -limit, limit, out=commands[:, :2])
+    return commands
+
+
+def run_variant(params, controls, dt=0.1):
+    sim = Simulation(1, 1, headless=True, dt=dt, **params)
+    commands = scale_controls(controls, sim.BASE_SPEED, sim.MAX_SPEED_RATIO)
+    start_position = sim.robot.position.copy()
+    trajectory = np.empty((len(commands), 9))
+
+    start = time.perf_counter()
+    sim.step(len(commands), commands, trajectory=trajectory)
+    elapsed = time.perf_counter() - start
+
+    positions = np.vstack([start_position, trajectory[:, :2]])
+    wheel_speeds = np.abs(trajectory[:, 3:6])
+    return {
+        "displacement_x": sim.robot.position[0] - start_position[0],
+        "displacement_y": sim.robot.position[1] - start_position[1],
+        "final_theta": sim.robot.orientation,
+        "path_length": float(np.hypot(*np.diff(positions, axis=0).T).sum()),
+        "max_wheel_speed": float(wheel_speeds.max()) if len(wheel_speeds) else 0.0,
+        "mean_wheel_speed": float(wheel_speeds.mean()) if len(wheel_speeds) else 0.0,
+        "elapsed": elapsed,
+    }
+
+
+# The scenario is shipped to each worker once through the pool initializer
+# rather than pickled with every task
+_worker_controls = None
+_worker_dt = None
+
+
+def _init_worker(controls, dt):
+    global _worker_controls, _worker_dt
+    _worker_controls = controls
+    _worker_dt = dt
+
+
+def _run_chunk(variants):
+    return [run_variant(params, _worker_controls, _worker_dt) for params in variants]
+
+
+def simulation_defaults():
+    # Simulation keyword arguments and their defaults
+    return {name: parameter.default for name, parameter in inspect.signature(Simulation).parameters.items()
+            if parameter.default is not inspect.Parameter.empty}
+
+
+def run_sweep(variants, controls, dt=0.1, workers=None, chunk_size=None):
+    # Unknown parameters would only fail inside the workers, so check first
+    defaults = simulation_defaults()
+    unknown = {name for params in variants for name in params} - set(defaults)
+    if unknown:
+        raise ValueError(f"unknown Simulation parameter(s): {', '.join(sorted(unknown))}")
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool balanced without per-task overhead
+        chunk_size = max(1, len(variants) // (workers * 4))
+    chunks = [variants[i:i + chunk_size] for i in range(0, len(variants), chunk_size)]
+    controls = np.asarray(controls, dtype=float)
+
+    if workers == 1:
+        _init_worker(controls, dt)
+        results = [_run_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(controls, dt)) as pool:
+            results = list(pool.map(_run_chunk, chunks))
+
+    return to_table(variants, [metrics for chunk in results for metrics in chunk])
+
+
+def to_table(variants, metrics):
+    table = {}
+    defaults = simulation_defaults()
+    for name in dict.fromkeys(name for params in variants for name in params):
+        table[name] = np.array([params.get(name, defaults.get(name)) for params in variants])
+    for name in METRICS:
+        table[name] = np.array([row[name] for row in metrics])
+    return table
+
+
+def save_table(path, table):
+    np.savez(path, **table)
+
+
+if __name__ == "__main__":
+    # Example: every chassis variant drives the same 60 s scripted maneuver
+    scenario = np.zeros((600, 3))
+    scenario[:200] = (0, 1, 0)
+    scenario[200:400] = (1, 0, 0.5)
+    scenario[400:] = (0, 6, -0.2)
+    variants = grid(
+        L=[50, 60, 70, 85, 100],
+        wheel_angles=[(90, -30, -150), (90, -150, -30)],
+        base_speed=[0.25, 0.5, 1.0],
+        max_speed_ratio=[3, 6],
+    )
+    start = time.perf_counter()
+    table = run_sweep(variants, scenario)
+    print(f"{len(variants)} variants in {time.perf_counter() - start:.2f}s")
+    best = int(np.argmax(table["path_length"]))
+    print("longest path:", {name: column[best].tolist() for name, column in table.items()})
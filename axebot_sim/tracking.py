@@ -0,0 +1,302 @@
+import bisect
+import math
+
+import numpy as np
+
+from .commands import CommandSource
+from .estimation import wrap_angle
+from .integrators import POSITION_SCALE, world_to_body
+
+# Closed-loop path following. Paths are polylines of (x, y) waypoints in
+# world pixels; a PathTracker turns them into body-frame (forward, sideways,
+# omega) commands for every robot at once, the same commands keyboard input
+# produces. The omni base is holonomic, so position and heading are
+# controlled independently: translation follows the path, omega only turns
+# the body towards the requested heading.
+
+METHODS = ("pure_pursuit", "feedback_linearization")
+_WINDOW_SEGMENTS = 16  # Most segments searched per robot and step
+
+
+class PathSet:
+    # Any number of paths packed into flat arrays: vertices, the unit tangent
+    # and length of the segment starting at each vertex, and the arc length
+    # at each vertex. Each path is offset in one global arc-length table so a
+    # single binary search finds the segment under any (path, s) pair.
+    def __init__(self, paths):
+        paths = [np.asarray(path, dtype=float).reshape(-1, 2) for path in paths]
+        # Repeated waypoints would make empty segments without a direction
+        paths = [path[np.concatenate([[True], (np.diff(path, axis=0) != 0).any(axis=1)])] for path in paths]
+        paths = [path if len(path) > 1 else np.repeat(path, 2, axis=0) for path in paths]  # One point: empty segment
+        counts = np.array([len(path) for path in paths])
+        self.starts = np.concatenate([[0], np.cumsum(counts)])  # First vertex of each path
+        self.vertices = np.concatenate(paths)
+        segments = np.diff(self.vertices, axis=0, append=self.vertices[-1:])
+        self.segment_lengths = np.hypot(segments[:, 0], segments[:, 1])
+        segments[self.starts[1:] - 1] = 0.0  # The last vertex of each path starts no segment
+        self.segment_lengths[self.starts[1:] - 1] = 0.0
+        self.segments = segments
+        self.tangents = segments / np.where(self.segment_lengths > 0, self.segment_lengths, 1.0)[:, None]
+        # Arc length of each vertex within its path
+        cumulative = np.concatenate([[0.0], np.cumsum(self.segment_lengths)[:-1]])
+        self.arc = cumulative - np.repeat(cumulative[self.starts[:-1]], counts)
+        self.lengths = self.arc[self.starts[1:] - 1]
+        # Global table: path p starts at base[p], one unit past the end of path p - 1
+        self._base = np.concatenate([[0.0], np.cumsum(self.lengths + 1.0)[:-1]])
+        self._global_arc = self.arc + np.repeat(self._base, counts)
+        # Per-segment (x, y, tangent x, tangent y, length, arc) rows for the
+        # scalar tracker, and the same columns contiguous for batched gathers
+        self._table = np.column_stack([self.vertices, self.tangents, self.segment_lengths, self.arc])
+        self._columns = np.ascontiguousarray(self._table.T)
+        self._rows = {}  # path -> (table rows, arcs) as lists, for the scalar tracker
+
+    def rows(self, path):
+        # One path's table rows and vertex arc lengths as plain Python lists
+        rows = self._rows.get(path)
+        if rows is None:
+            table = self._table[self.starts[path]:self.starts[path + 1]].tolist()
+            rows = self._rows[path] = (table, [row[5] for row in table])
+        return rows
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def segment_at(self, path, s):
+        # Segment (index of its start vertex) containing arc length s of each path
+        s = np.clip(s, 0.0, self.lengths[path])
+        segment = np.searchsorted(self._global_arc, self._base[path] + s, side="right") - 1
+        return np.clip(segment, self.starts[path], np.maximum(self.starts[path + 1] - 2, self.starts[path]))
+
+    def point_at(self, path, s):
+        # Points and unit tangents at arc length s (clamped to the path)
+        s = np.clip(s, 0.0, self.lengths[path])
+        segment = self.segment_at(path, s)
+        points = self.vertices[segment] + self.tangents[segment] * (s - self.arc[segment])[:, None]
+        return points, self.tangents[segment]
+
+    def closest(self, path, points, progress=None, window=100.0):
+        # Closest point on each robot's path: (s, point, tangent). With
+        # progress (the last s of each robot) only the window of arc length
+        # ahead of it is searched, which is what a tracker needs each step:
+        # progress never goes back, so hairpins, closed loops and crossings
+        # are followed in order. Without progress the whole path is searched.
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        path = np.broadcast_to(path, (len(points),))
+        first, last = self.starts[path], np.maximum(self.starts[path + 1] - 2, self.starts[path])
+        if progress is not None:
+            low = np.clip(progress, 0.0, self.lengths[path])
+            high = np.minimum(low + window, self.lengths[path])
+            start, stop = self.segment_at(path, low), self.segment_at(path, high)
+            width = min(int((stop - start).max()) + 1, _WINDOW_SEGMENTS) if len(points) else 1
+            candidates = np.minimum(start[:, None] + np.arange(width), stop[:, None])
+            s, nearest, segment = self._nearest(points, candidates, low, high)
+        else:
+            # Whole-path search, in chunks of robots to bound the (robots, segments) arrays
+            width = int((last - first).max()) + 1 if len(points) else 1
+            s, nearest = np.empty(len(points)), np.empty((len(points), 2))
+            segment = np.empty(len(points), dtype=np.intp)
+            chunk = max(1, (1 << 20) // width)
+            for start in range(0, len(points), chunk):
+                rows = slice(start, start + chunk)
+                candidates = np.minimum(first[rows, None] + np.arange(width), last[rows, None])
+                s[rows], nearest[rows], segment[rows] = self._nearest(points[rows], candidates)
+        # The tangent ahead of s: at a vertex both segments are equally close,
+        # and the incoming one would point the robot back at the corner
+        ahead = (s >= self.arc[segment] + self.segment_lengths[segment]) & (segment < last)
+        return s, nearest, self.tangents[segment + ahead]
+
+    def _nearest(self, points, candidates, low=None, high=None):
+        # Project every point onto its (N, W) candidate segments, restricted
+        # to arc lengths low .. high if given, and keep the closest: (s, point, segment)
+        x, y, tx, ty, lengths, arc = (column[candidates] for column in self._columns)
+        dx, dy = points[:, :1] - x, points[:, 1:] - y
+        along = dx * tx
+        along += dy * ty
+        if low is not None:
+            np.minimum(lengths, high[:, None] - arc, out=lengths)
+        np.minimum(along, lengths, out=along)
+        if low is not None:
+            np.maximum(along, low[:, None] - arc, out=along)
+        np.maximum(along, 0.0, out=along)
+        # Offset from the projection, reusing the delta arrays
+        tx *= along
+        ty *= along
+        dx -= tx
+        dy -= ty
+        dx *= dx
+        dy *= dy
+        dx += dy
+        best = np.argmin(dx, axis=1)
+        rows = np.arange(len(points))
+        segment = candidates[rows, best]
+        along, arc = along[rows, best], arc[rows, best]
+        nearest = np.column_stack([x[rows, best] + tx[rows, best], y[rows, best] + ty[rows, best]])
+        return arc + along, nearest, segment
+
+
+class PathTracker:
+    def __init__(self, paths, assignment=None, speed=0.5, method="pure_pursuit", lookahead=50.0, gain=2.0,
+                 heading=None, heading_gain=2.0, window=100.0):
+        # paths: a PathSet or a list of waypoint arrays; assignment[i] is the
+        # path robot i follows (default: robot i follows path i).
+        # speed: cruise speed in command units, like base_speed.
+        # method: "pure_pursuit" steers at the point lookahead pixels further
+        # along the path; "feedback_linearization" feeds the path tangent
+        # forward and corrects the position error with gain (1/s). The
+        # holonomic kinematics make the world velocity a direct input, so the
+        # error dynamics are exactly linear.
+        # heading: None leaves the heading alone, "tangent" faces the robot's
+        # forward axis along the path, a number holds that angle (radians).
+        # window: arc length ahead of the progress so far searched for the
+        # closest point each step; it must exceed a step's travel.
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+        self.paths = paths if isinstance(paths, PathSet) else PathSet(paths)
+        self.assignment = np.arange(len(self.paths)) if assignment is None else np.asarray(assignment)
+        self.speed = speed
+        self.method = method
+        self.lookahead = lookahead
+        self.gain = gain
+        self.heading = heading
+        self.heading_gain = heading_gain
+        self.window = window
+        self.progress = None  # Arc length reached by each robot
+
+    def __len__(self):
+        return len(self.assignment)
+
+    def reset(self, progress=None):
+        # Restart every robot at arc length progress, or at the start of its
+        # path. Tracking only searches ahead of the progress so far, which
+        # keeps closed and self-crossing paths in order.
+        self.progress = None if progress is None else np.array(
+            np.broadcast_to(np.asarray(progress, dtype=float), (len(self.assignment),)))
+
+    def remaining(self):
+        # Arc length left to the end of each robot's path
+        if self.progress is None:
+            return self.paths.lengths[self.assignment].copy()
+        return self.paths.lengths[self.assignment] - self.progress
+
+    def command(self, positions, orientations, out=None):
+        # (N, 3) body-frame commands for robots at positions (N, 2) with
+        # orientations (N,), in out if given
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        orientations = np.broadcast_to(np.asarray(orientations, dtype=float), (len(positions),))
+        path = self.assignment
+        if self.progress is None:
+            self.progress = np.zeros(len(path))
+        self.progress, nearest, tangent = self.paths.closest(path, positions, self.progress, self.window)
+        remaining = self.paths.lengths[path] - self.progress
+
+        if self.method == "pure_pursuit":
+            target, _ = self.paths.point_at(path, self.progress + self.lookahead)
+            direction = target - positions
+            distance = np.hypot(direction[:, 0], direction[:, 1])
+            # Full speed until the target stops moving at the end of the path
+            speed = np.minimum(self.speed, self.gain * distance / POSITION_SCALE)
+            velocity = direction * (speed / np.where(distance > 0, distance, 1.0))[:, None]
+        else:
+            along = np.minimum(self.speed, self.gain * remaining / POSITION_SCALE)
+            velocity = tangent * along[:, None]
+            error = nearest - positions
+            # Off a segment's interior (overshooting a sharp corner) the
+            # feedforward can point away from the path and cancel the
+            # correction; drop its component against the error. On a segment
+            # the error is normal to the tangent and this changes nothing.
+            against = np.minimum(np.einsum("ij,ij->i", velocity, error), 0.0)
+            squared = np.einsum("ij,ij->i", error, error)
+            velocity -= error * (against / np.where(squared > 0, squared, 1.0))[:, None]
+            velocity += error * (self.gain / POSITION_SCALE)
+
+        if out is None:
+            out = np.empty((len(positions), 3))
+        out[:, 0], out[:, 1] = world_to_body(orientations, velocity[:, 0], velocity[:, 1])
+        if self.heading is None:
+            out[:, 2] = 0.0
+        else:
+            if self.heading == "tangent":
+                # The forward command drives along -(cos, sin) of the orientation
+                reference = np.arctan2(-tangent[:, 1], -tangent[:, 0])
+            else:
+                reference = self.heading
+            out[:, 2] = self.heading_gain * wrap_angle(reference - orientations)
+        return out
+
+    def command_one(self, x, y, theta, robot=0):
+        # command() for one robot, as TrackingCommands needs every step: the
+        # window search walks the path's cached rows segment by segment in
+        # floats instead of gathering candidate arrays
+        if self.progress is None:
+            self.progress = np.zeros(len(self.assignment))
+        path = int(self.assignment[robot])
+        rows, arcs = self.paths.rows(path)
+        last = max(len(rows) - 2, 0)
+        length = arcs[-1]
+        low = min(max(float(self.progress[robot]), 0.0), length)
+        high = min(low + self.window, length)
+        # Closest point over the window, as PathSet.closest
+        segment = min(max(bisect.bisect_right(arcs, low) - 1, 0), last)
+        best = math.inf
+        for _ in range(_WINDOW_SEGMENTS):
+            vx, vy, tx, ty, segment_length, arc = rows[segment]
+            along = (x - vx) * tx + (y - vy) * ty
+            along = max(min(along, high - arc, segment_length), low - arc, 0.0)
+            px, py = vx + tx * along, vy + ty * along
+            distance = (x - px) * (x - px) + (y - py) * (y - py)
+            if distance < best:
+                best, s, nearest_x, nearest_y, found = distance, arc + along, px, py, segment
+            if segment >= last or arcs[segment + 1] > high:
+                break
+            segment += 1
+        row = rows[found]
+        if s >= row[5] + row[4] and found < last:
+            row = rows[found + 1]
+        tx, ty = row[2], row[3]
+        self.progress[robot] = s
+
+        if self.method == "pure_pursuit":
+            target = min(s + self.lookahead, length)
+            segment = min(max(bisect.bisect_right(arcs, target) - 1, 0), last)
+            ox, oy, ux, uy, _, arc = rows[segment]
+            dx, dy = ox + ux * (target - arc) - x, oy + uy * (target - arc) - y
+            distance = math.hypot(dx, dy)
+            speed = min(self.speed, self.gain * distance / POSITION_SCALE)
+            scale = speed / distance if distance > 0 else 0.0
+            vx, vy = dx * scale, dy * scale
+        else:
+            along = min(self.speed, self.gain * (length - s) / POSITION_SCALE)
+            vx, vy = tx * along, ty * along
+            ex, ey = nearest_x - x, nearest_y - y
+            against = min(vx * ex + vy * ey, 0.0)
+            squared = ex * ex + ey * ey
+            if squared > 0:
+                vx -= ex * against / squared
+                vy -= ey * against / squared
+            vx += ex * (self.gain / POSITION_SCALE)
+            vy += ey * (self.gain / POSITION_SCALE)
+
+        cos_theta, sin_theta = math.cos(theta), math.sin(theta)
+        omega = 0.0
+        if self.heading is not None:
+            reference = math.atan2(-ty, -tx) if self.heading == "tangent" else self.heading
+            omega = self.heading_gain * ((reference - theta + math.pi) % (2 * math.pi) - math.pi)
+        return -vx * cos_theta - vy * sin_theta, vx * sin_theta - vy * cos_theta, omega
+
+
+class TrackingCommands(CommandSource):
+    # Feeds a single-robot PathTracker to a Simulation. Commands depend on the
+    # robot's pose, so the simulation computes them one step at a time.
+    feedback = True
+
+    def __init__(self, tracker, robot):
+        self.tracker = tracker
+        self.robot = robot
+        self._last = (None, (0.0, 0.0, 0.0))  # (step, command), so repeated lookups don't advance progress
+
+    def command(self, step):
+        if step != self._last[0]:
+            position = self.robot.position
+            self._last = (step, self.tracker.command_one(float(position[0]), float(position[1]),
+                                                         float(self.robot.orientation)))
+        return self._last[1]
@@ -1,6 +1,8 @@
 import pygame
 import numpy as np
 
+from axebot_sim.sprites import SpriteCache
+
 pygame.init()
 
 GREEN = (0, 255, 0)
@@ -18,6 +20,8 @@ image_orig = pygame.Surface((150,75))
 image_orig.set_colorkey((255,0,0))
 image_orig.fill((255,255,255))
 
+image_sprites = SpriteCache(image_orig, resolution=1.0)
+
 image = image_orig.copy()
 image.set_colorkey(BLACK)
 rect = image.get_rect()
@@ -35,7 +39,7 @@ while run:
     old_center = rect.center
     rot = (rot + rot_speed) % 360
     # rotating the origonal image
-    new_image = pygame.transform.rotate(image_orig, 45)
+    new_image = image_sprites.get(45)
     # 
     rect = new_image.get_rect()
     # set the rotated rectangel to the old center
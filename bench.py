@@ -0,0 +1,479 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+import numpy as np
+
+# Rendering is benchmarked offscreen; the dummy driver needs no window or display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from axebot_sim import (PRESETS, GridPlanner, ObstacleMap, OdometryModel, PathTracker, RangeSensor, Robot, RobotFleet,
+                        Simulation, TrackingCommands, WheelMotors, dead_reckon)
+from axebot_sim.estimation import FleetEKF, wrap_angle
+from axebot_sim.integrators import POSITION_SCALE
+from axebot_sim.kinematics import integrate_fused_python, load_numba_kernel
+from axebot_sim.obstacles import random_walls
+
+# Benchmark suite for the kinematics, integration and rendering hot paths.
+#
+#   python bench.py                              print results
+#   python bench.py --json out.json              also write them as JSON
+#   python bench.py --save-baseline base.json    record a baseline
+#   python bench.py --baseline base.json         compare, exit 1 on regression
+#   python bench.py startup                      check the startup budget only
+#
+# Every result is a flat "group.name" key. Keys ending in _us are times in
+# microseconds (lower is better) and are the ones checked against a baseline;
+# anything else (speedups, counts) is informational. Results listed in
+# BUDGETS must also stay under a fixed limit.
+
+FLEET_SIZES = (100, 10000)
+EKF_SIZES = (100, 1000)  # The naive per-robot filter is too slow for more
+# Wheel motor model used by the *_motors benchmarks, with every limit active
+MOTORS = dict(time_constant=0.1, max_speed=50, max_torque=10, max_acceleration=100, slip=0.05)
+PATH_WAYPOINTS = 20  # Waypoints of each robot's path in the tracking benchmarks
+ARENA_WALLS = 300  # Walls in the obstacle benchmarks' 1280x720 arena
+PLANNING_WALLS = 60  # Walls in the planning benchmarks' arena, sparse enough to cross
+
+# Allowed slowdown against the baseline before a result counts as a
+# regression, as a fraction. Rendering goes through SDL and is noisier. An
+# explicit --threshold applies to every entry, these included.
+DEFAULT_THRESHOLD = 0.10
+THRESHOLDS = {
+    "render.": 0.25,
+}
+
+# Absolute limits checked on every run, baseline or not. Short-lived sweep
+# workers pay the startup cost once per process, so importing the package and
+# a first headless batch must stay cheap and must not load pygame or Numba.
+BUDGETS = {
+    "startup.import_us": 200e3,
+    "startup.headless_us": 250e3,
+    "startup.pygame_modules": 0,
+    "startup.numba_modules": 0,
+    # The motor model may at most double the cost of a batched physics step
+    # (about 1.5-1.75x). The exception is a single robot without Numba: there
+    # the motor arithmetic is pure Python and costs about as much as the rest
+    # of the step, measured at 1.75-2.05x, so it gets headroom over the noise
+    "sim.1.advance_motors_ratio": 2.5,
+    "sim.1.step_motors_ratio": 2.5,
+    **{f"sim.{size}.fleet_motors_ratio": 2.0 for size in FLEET_SIZES},
+}
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import axebot_sim
+imported = time.perf_counter()
+sim = axebot_sim.Simulation(1, 1, headless=True)
+sim.step(1000, (0.5, -0.2, 0.3))
+done = time.perf_counter()
+modules = list(sys.modules)
+print(json.dumps([imported - start, done - start,
+                  sum(name.split(".")[0] == "pygame" for name in modules),
+                  sum(name.split(".")[0] == "numba" for name in modules)]))
+"""
+
+
+def uncached_wheel_speeds(robot, vx, vy, omega):
+    # What every frame used to cost: rebuild the matrix and invert it per call
+    a = robot.wheel_angles
+    T = np.array([
+        [np.sin(a[0]), -np.cos(a[0]), -robot.L],
+        [np.sin(a[1]), -np.cos(a[1]), -robot.L],
+        [np.sin(a[2]), -np.cos(a[2]), -robot.L]
+    ])
+    return np.linalg.inv(T) @ np.array([vx, vy, omega])
+
+
+def naive_ekf_step(states, covariances, velocities, noise, fixes, fix_noise, dt):
+    # Reference for FleetEKF: the same world-frame predict and full pose
+    # update, written robot by robot with 3x3 NumPy operations
+    scale = np.array([dt * POSITION_SCALE, dt * POSITION_SCALE, dt])
+    for state, covariance, velocity, fix in zip(states, covariances, velocities, fixes):
+        state += velocity * scale
+        covariance += noise * np.outer(scale, scale)
+        innovation = fix - state
+        innovation[2] = wrap_angle(innovation[2])
+        gain = covariance @ np.linalg.inv(covariance + fix_noise)
+        state += gain @ innovation
+        covariance[:] = (np.eye(3) - gain) @ covariance
+
+
+def time_call(fn, number, repeat=5):
+    # Best-of-repeat time per call in microseconds
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def bench_presets(number=20000):
+    # Kinematics with each script version's geometry (see axebot_sim/presets.py)
+    results = {}
+    for name, preset in PRESETS.items():
+        robot = Robot(position=[0, 0], orientation=0, L=preset["L"], wheel_angles=preset["wheel_angles"],
+                      color=None, matrix_offset=preset["matrix_offset"])
+        results[f"presets.{name}.wheel_speeds_us"] = time_call(
+            lambda: robot.calculate_wheel_speeds(0.5, -0.2, 0.3), number)
+        results[f"presets.{name}.robot_velocity_us"] = time_call(
+            lambda: robot.calculate_robot_velocity(0.1, 0.2, 0.3), number)
+    return results
+
+
+def bench_robot(number=20000):
+    robot = Robot(position=[0, 0], orientation=0, L=85, wheel_angles=[90, -30, -150], color=None)
+    assert np.allclose(uncached_wheel_speeds(robot, 0.5, -0.2, 0.3),
+                       robot.calculate_wheel_speeds(0.5, -0.2, 0.3))
+
+    uncached = time_call(lambda: uncached_wheel_speeds(robot, 0.5, -0.2, 0.3), number)
+    cached = time_call(lambda: robot.calculate_wheel_speeds(0.5, -0.2, 0.3), number)
+    return {
+        "robot.wheel_speeds_uncached_us": uncached,
+        "robot.wheel_speeds_us": cached,
+        "robot.wheel_speeds_speedup": uncached / cached,
+        "robot.robot_velocity_us": time_call(lambda: robot.calculate_robot_velocity(0.1, 0.2, 0.3), number),
+        "robot.fused_kinematics_us": time_call(lambda: robot.fused_kinematics(0.5, -0.2, 0.3), number),
+        "robot.update_us": time_call(lambda: robot.update(0.01, -0.01, 0.001, 0.1), number),
+    }
+
+
+def bench_kernels(number=20000):
+    # Per-step cost of the batched fused kernels (heading projection, kinematics, integration)
+    robot = Robot(position=[0, 0], orientation=0, L=85, wheel_angles=[90, -30, -150], color=None)
+    coefficients = robot.get_kinematics_coefficients()
+    controls = np.broadcast_to(np.array([0.5, -0.2, 0.3]), (number, 3))
+    pose, wheel_speeds = np.zeros(3), np.zeros(3)
+    kernels = {"kernel.fused_step_python_us": integrate_fused_python}
+    integrate_fused_numba = load_numba_kernel()
+    if integrate_fused_numba is not None:
+        integrate_fused_numba(coefficients, pose, controls[:1], 0.1, wheel_speeds)  # compile outside the timing
+        kernels["kernel.fused_step_numba_us"] = integrate_fused_numba
+    return {name: time_call(lambda: kernel(coefficients, pose, controls, 0.1, wheel_speeds), 1) / number
+            for name, kernel in kernels.items()}
+
+
+def bench_render(number=2000):
+    # Robot.draw and render_status onto an offscreen surface
+    pygame.display.init()
+    pygame.font.init()
+    try:
+        screen = pygame.Surface((1280, 720))
+        robot = Robot(position=[640, 360], orientation=0, L=85, wheel_angles=[90, -30, -150], color=(100, 150, 255))
+        robot.draw(screen)
+        robot.render_status(screen, 0.1, 0.2, 0.3)  # Build the font and HUD outside the timing
+        circles = Robot(position=[640, 360], orientation=0, L=85, wheel_angles=[90, -30, -150],
+                        color=(100, 150, 255), wheel_style="circles")
+
+        orientations = iter(np.linspace(0, 2 * np.pi, number * 5 + 1).tolist())
+        values = iter(np.arange(number * 5 + 1) * 0.01)
+        results = {
+            "render.draw_us": time_call(lambda: robot.draw(screen), number),
+            "render.draw_rotating_us": time_call(lambda: robot.draw(screen, orientation=next(orientations)), number),
+            "render.draw_circles_us": time_call(lambda: circles.draw(screen), number),
+            # Steady values are served from the text cache; changing ones re-render every line
+            "render.render_status_us": time_call(lambda: robot.render_status(screen, 0.1, 0.2, 0.3), number),
+            "render.render_status_changing_us": time_call(
+                lambda: robot.render_status(screen, *[next(values)] * 3), number),
+            "render.fill_us": time_call(lambda: screen.fill((86, 125, 70)), number),
+        }
+    finally:
+        pygame.quit()
+    return results
+
+
+def bench_simulation(number=2000):
+    # Full physics steps: one robot through Simulation, many through RobotFleet
+    command = (0.5, -0.2, 0.3)
+    sim = Simulation(1, 1, headless=True)
+    results = {
+        # The interactive loop's per-step path
+        "sim.1.advance_us": time_call(lambda: sim.advance(*sim.to_world_velocity(*command)), number),
+        # A batch of steps through the fused kernel
+        "sim.1.step_us": time_call(lambda: sim.step(number, command), 1) / number,
+    }
+    track_sim = Simulation(1, 1, headless=True)
+    track_sim.set_command_source(TrackingCommands(PathTracker([[(0, 0), (1e6, 0)]]), track_sim.robot))
+    results["sim.1.track_step_us"] = time_call(lambda: track_sim.step(number), 1) / number
+    motor_sim = Simulation(1, 1, headless=True, motors=MOTORS)
+    results["sim.1.advance_motors_us"] = time_call(
+        lambda: motor_sim.advance(*motor_sim.to_world_velocity(*command)), number)
+    results["sim.1.step_motors_us"] = time_call(lambda: motor_sim.step(number, command), 1) / number
+    for name in ("advance", "step"):
+        results[f"sim.1.{name}_motors_ratio"] = results[f"sim.1.{name}_motors_us"] / results[f"sim.1.{name}_us"]
+
+    for size in FLEET_SIZES:
+        fleet = RobotFleet(np.zeros((size, 2)), 0.0, 85, (90, -30, -150))
+        body_commands = np.tile(command, (size, 1))
+        steps = max(1, number * 100 // size)
+        results[f"sim.{size}.fleet_step_us"] = time_call(lambda: fleet.step(0.1, steps, body_commands), 1) / steps
+        fleet.motors = WheelMotors(size, **MOTORS)
+        results[f"sim.{size}.fleet_motors_step_us"] = time_call(
+            lambda: fleet.step(0.1, steps, body_commands), 1) / steps
+        results[f"sim.{size}.fleet_motors_ratio"] = (results[f"sim.{size}.fleet_motors_step_us"]
+                                                     / results[f"sim.{size}.fleet_step_us"])
+        # Same, spread out so robots meet, with collisions resolved every step
+        fleet = RobotFleet(np.random.default_rng(0).uniform(0, 300 * size ** 0.5, (size, 2)), 0.0, 85, (90, -30, -150))
+        results[f"sim.{size}.fleet_collide_step_us"] = time_call(
+            lambda: fleet.step(0.1, steps, body_commands, collide=True), 1) / steps
+        # Noisy encoders and gyro for every robot over the run, then dead reckoning
+        odometry = OdometryModel(size, seed=0, encoder_noise=0.01, encoder_bias=0.005, gyro_noise=0.01)
+        wheel_speeds = np.broadcast_to(fleet.wheel_speeds, (steps, size, 3))
+        omega = np.broadcast_to(fleet.velocities[:, 2], (steps, size))
+
+        def odometry_run():
+            encoders, gyro = odometry.measure(wheel_speeds, omega)
+            return dead_reckon(fleet.T, encoders, 0.1, gyro=gyro)
+
+        results[f"sim.{size}.odometry_step_us"] = time_call(odometry_run, 1) / steps
+        # Closed-loop path following: every robot tracks its own random walk
+        paths = np.cumsum(np.random.default_rng(0).normal(0, 40, (size, PATH_WAYPOINTS, 2)), axis=1)
+        fleet = RobotFleet(paths[:, 0], 0.0, 85, (90, -30, -150))
+        tracker = PathTracker(paths, method="feedback_linearization", heading="tangent")
+        results[f"sim.{size}.fleet_track_step_us"] = time_call(lambda: fleet.track(tracker, 0.1, steps), 1) / steps
+    return results
+
+
+def bench_ekf(number=20):
+    # One predict and full pose update for every robot: FleetEKF against the
+    # naive per-robot loop
+    rng = np.random.default_rng(0)
+    noise, fix_noise = np.diag([1e-3, 1e-3, 1e-4]), np.eye(3) * 0.5
+    results = {}
+    for size in EKF_SIZES:
+        velocities = rng.normal(0, 1, (size, 3))
+        fixes = rng.uniform(0, 100, (size, 3))
+        ekf = FleetEKF(fixes, 1.0)
+
+        def batched():
+            ekf.predict(velocities, 0.1, noise)
+            ekf.update(fixes, fix_noise)
+
+        states, covariances = fixes.copy(), np.tile(np.eye(3), (size, 1, 1))
+        batched_us = time_call(batched, number)
+        naive_us = time_call(lambda: naive_ekf_step(states, covariances, velocities, noise, fixes, fix_noise, 0.1),
+                             max(1, number // 10), 3)
+        results[f"ekf.{size}.step_us"] = batched_us
+        results[f"ekf.{size}.naive_step_us"] = naive_us
+        results[f"ekf.{size}.speedup"] = naive_us / batched_us
+    return results
+
+
+def bench_obstacles(number=2000):
+    # An arena of ARENA_WALLS walls: building the distance field once, then
+    # per-step costs with robots bumping into walls, range sensor scans and
+    # the background blit
+    walls = random_walls(1280, 720, ARENA_WALLS)
+    obstacles = ObstacleMap.from_polygons(walls, 1280, 720, cell_size=4)
+    command = (0.5, -0.2, 0.3)
+    sim = Simulation(1280, 720, headless=True, L=15, obstacles=obstacles)
+    fleet = RobotFleet(np.random.default_rng(0).uniform(0, (1280, 720), (1000, 2)), 0.0, 15, (90, -30, -150),
+                       obstacles=obstacles)
+    body_commands = np.tile(command, (1000, 1))
+    results = {
+        "obstacles.build_us": time_call(lambda: ObstacleMap.from_polygons(walls, 1280, 720, cell_size=4), 1, 3),
+        "obstacles.advance_us": time_call(lambda: sim.advance(*sim.to_world_velocity(*command)), number),
+        "obstacles.step_us": time_call(lambda: sim.step(number, command), 1) / number,
+        "obstacles.1000.fleet_step_us": time_call(lambda: fleet.step(0.1, 20, body_commands), 1) / 20,
+    }
+    lidar = RangeSensor.lidar(360)
+    results["obstacles.lidar_360_us"] = time_call(lambda: lidar.scan(sim.robot.position, 0.3, obstacles), 20)
+    # Every robot of the fleet scanning the walls and each other
+    fan = RangeSensor.lidar(32)
+    results["obstacles.1000.scan_32_us"] = time_call(lambda: fleet.scan(fan), 1, 3)
+
+    from axebot_sim.frontend import make_background
+
+    pygame.display.init()
+    try:
+        pygame.display.set_mode((1280, 720))
+        screen = pygame.Surface((1280, 720))
+        background = make_background(1280, 720, obstacles)
+        results["render.background_blit_us"] = time_call(lambda: screen.blit(background, (0, 0)), number)
+    finally:
+        pygame.quit()
+    return results
+
+
+def bench_planning(number=5):
+    # Planning across the arena from corner to corner: a fresh A* search, a
+    # repeated query answered by the plan cache, and D* Lite repairing its
+    # plan after a block appears on the path just ahead of the robot, as when
+    # its sensors find one (the map update itself, which rebuilds the
+    # distance field, is not timed)
+    walls = random_walls(1280, 720, PLANNING_WALLS)
+    obstacles = ObstacleMap.from_polygons(walls, 1280, 720, cell_size=4)
+    start, goal = (30.0, 30.0), (1250.0, 690.0)
+    planner = GridPlanner(obstacles, radius=10)
+    uncached = GridPlanner(obstacles, radius=10, cache_size=0)
+    results = {
+        "planning.build_us": time_call(lambda: GridPlanner(obstacles, radius=10), 1, 3),
+        "planning.astar_us": time_call(lambda: uncached.plan(start, goal), 1, number),
+        "planning.cache_hit_us": time_call(lambda: planner.plan(start, goal), 1000),
+    }
+    results["planning.cache_speedup"] = results["planning.astar_us"] / results["planning.cache_hit_us"]
+
+    path = uncached.plan(start, goal)
+    first = path[1] - path[0]
+    ahead = path[0] + first * min(1.0, 100.0 / np.hypot(*first))
+    x, y = (ahead // obstacles.cell_size).astype(int)
+    free, blocked = obstacles.occupancy, obstacles.occupancy.copy()
+    blocked[y - 4:y + 4, x - 4:x + 4] = True
+    replanner = planner.replanner(goal)
+    replanner.plan(start)
+    replan, fresh = [], []
+    for occupancy in [blocked, free] * number:
+        obstacles.update(occupancy)
+        began = time.perf_counter()
+        replanner.plan(start)
+        replan.append(time.perf_counter() - began)
+        fresh.append(time_call(lambda: uncached.plan(start, goal), 1, 1))
+    results["planning.dstar_replan_us"] = min(replan) * 1e6
+    results["planning.dstar_speedup"] = min(fresh) / results["planning.dstar_replan_us"]
+    return results
+
+
+def bench_startup(number=5):
+    # Fresh interpreters: importing axebot_sim, then that plus a headless
+    # Simulation running 1000 steps, and the whole process wall time.
+    # Best of number runs.
+    runs = []
+    for _ in range(number):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        runs.append([time.perf_counter() - start] + json.loads(output.splitlines()[-1]))
+    process, imported, headless, pygame_modules, numba_modules = (min(column) for column in zip(*runs))
+    return {
+        "startup.import_us": imported * 1e6,
+        "startup.headless_us": headless * 1e6,
+        "startup.process_us": process * 1e6,
+        "startup.pygame_modules": pygame_modules,
+        "startup.numba_modules": numba_modules,
+    }
+
+
+# Group name -> (function, default iteration count)
+BENCHMARKS = {
+    "presets": (bench_presets, 20000),
+    "robot": (bench_robot, 20000),
+    "kernel": (bench_kernels, 20000),
+    "render": (bench_render, 2000),
+    "sim": (bench_simulation, 2000),
+    "ekf": (bench_ekf, 20),
+    "obstacles": (bench_obstacles, 2000),
+    "planning": (bench_planning, 5),
+    "startup": (bench_startup, 5),
+}
+
+
+def run_benchmarks(groups=None, scale=1.0):
+    # scale multiplies every iteration count, e.g. 0.1 for a quick run
+    results = {}
+    for name, (bench, number) in BENCHMARKS.items():
+        if groups and name not in groups:
+            continue
+        results.update(bench(max(1, int(number * scale))))
+    return results
+
+
+def environment():
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba_version,
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def threshold_for(name, default=None):
+    # Per-prefix thresholds only stand in when no threshold was given
+    if default is not None:
+        return default
+    for prefix, threshold in THRESHOLDS.items():
+        if name.startswith(prefix):
+            return threshold
+    return DEFAULT_THRESHOLD
+
+
+def compare(results, baseline, default=None):
+    # Returns {name: (baseline, current, ratio, regressed)} for every timing
+    # present in both runs
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not name.endswith("_us") or previous is None or previous <= 0:
+            continue
+        ratio = current / previous
+        comparison[name] = (previous, current, ratio, ratio > 1 + threshold_for(name, default))
+    return comparison
+
+
+def over_budget(results):
+    # {name: (value, budget)} for every result above its BUDGETS entry
+    return {name: (results[name], budget) for name, budget in BUDGETS.items()
+            if name in results and results[name] > budget}
+
+
+def save_json(path, results):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the kinematics, integration and rendering hot paths")
+    parser.add_argument("groups", nargs="*", help=f"groups to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results as the new baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float,
+                        help=f"allowed slowdown as a fraction for every entry (default: {DEFAULT_THRESHOLD}, "
+                             f"or per-prefix: {', '.join(f'{p}* {t}' for p, t in THRESHOLDS.items())})")
+    parser.add_argument("--scale", type=float, default=1.0, help="iteration count multiplier, e.g. 0.1 for a quick run")
+    args = parser.parse_args(argv)
+    unknown = set(args.groups) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark group(s): {', '.join(sorted(unknown))}")
+
+    results = run_benchmarks(args.groups, args.scale)
+    for path in (args.json, args.save_baseline):
+        if path:
+            save_json(path, results)
+
+    comparison = compare(results, load_json(args.baseline), args.threshold) if args.baseline else {}
+    budgets = over_budget(results)
+    regressions = 0
+    for name, value in results.items():
+        line = f"{name:40s} {value:10.4f}"
+        if name in comparison:
+            previous, current, ratio, regressed = comparison[name]
+            regressions += regressed
+            line += f"  baseline {previous:10.4f}  {ratio:6.2f}x" + ("  REGRESSION" if regressed else "")
+        if name in budgets:
+            line += f"  OVER BUDGET ({budgets[name][1]:g})"
+        print(line)
+    if regressions:
+        print(f"{regressions} regression(s) against {args.baseline}")
+    if budgets:
+        print(f"{len(budgets)} result(s) over budget")
+    return 1 if regressions or budgets else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from axebot_sim import RobotFleet, get_preset
+from axebot_sim.robot import Robot
+
+
+@pytest.mark.parametrize("preset", ["v0", "v8"])
+def test_from_robots_matches_robots(preset):
+    # v0 builds its matrices with a 90 degree matrix_offset, v8 without
+    config = get_preset(preset)
+    rng = np.random.default_rng(0)
+    robots = [Robot(position=position, orientation=orientation, L=config["L"], wheel_angles=config["wheel_angles"],
+                    color=None, matrix_offset=config["matrix_offset"])
+              for position, orientation in zip(rng.uniform(0, 500, (4, 2)), rng.uniform(-np.pi, np.pi, 4))]
+    fleet = RobotFleet.from_robots(robots)
+    body_commands = rng.uniform(-1, 1, (len(robots), 3))
+    dt = 0.1
+
+    for _ in range(20):
+        fleet.step(dt, 1, body_commands)
+        for robot, (forward_speed, sideways_speed, omega) in zip(robots, body_commands.tolist()):
+            cos_theta, sin_theta = np.cos(robot.orientation), np.sin(robot.orientation)
+            vx = -forward_speed * cos_theta + sideways_speed * sin_theta
+            vy = -forward_speed * sin_theta - sideways_speed * cos_theta
+            robot.update(*robot.fused_kinematics(vx, vy, omega)[3:], dt)
+
+    np.testing.assert_allclose(fleet.T, [robot.get_transformation_matrix() for robot in robots], atol=1e-12)
+    np.testing.assert_allclose(fleet.positions, [robot.position for robot in robots], atol=1e-9)
+    np.testing.assert_allclose(fleet.orientations, [robot.orientation for robot in robots], atol=1e-12)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from axebot_sim import GridPlanner, ObstacleMap
+
+
+def segments_visible(planner, path):
+    return all(planner.visible(a, b[None])[0] for a, b in zip(path[:-1], path[1:]))
+
+
+def test_cache_keys_on_start_cells():
+    # 7 and 9 px fall in neighboring 4 px cells, so they must not share a plan
+    planner = GridPlanner(ObstacleMap(np.zeros((10, 10), dtype=bool), cell_size=4))
+    planner.plan((7.0, 7.0), (30.0, 30.0))
+    planner.plan((9.0, 7.0), (30.0, 30.0))
+    assert (planner.hits, planner.misses) == (0, 2)
+    planner.plan((5.0, 6.0), (29.0, 31.0))
+    assert (planner.hits, planner.misses) == (1, 2)
+
+
+def test_shared_plan_rechecked_from_actual_start():
+    # With a two-cell quantum, cells 1 and 2 of a row share cache keys. The
+    # straight plan down column 1 can't be reused from column 2, whose line
+    # to the goal cuts through the blocked cell below it.
+    occupancy = np.zeros((12, 12), dtype=bool)
+    occupancy[2, 2] = True
+    planner = GridPlanner(ObstacleMap(occupancy, cell_size=4), quantum=8)
+    goal = (6.0, 34.0)
+    assert len(planner.plan((6.0, 6.0), goal)) == 2
+    # Reused from the cell below, which sees the goal too
+    planner.plan((6.0, 10.0), goal)
+    assert (planner.hits, planner.misses) == (1, 1)
+    path = planner.plan((10.0, 6.0), goal)
+    assert (planner.hits, planner.misses) == (1, 2)
+    assert segments_visible(planner, path)
+
+
+def test_cached_plan_dropped_when_its_line_is_blocked():
+    occupancy = np.zeros((100, 200), dtype=bool)
+    obstacles = ObstacleMap(occupancy, cell_size=4)
+    planner = GridPlanner(obstacles)
+    assert len(planner.plan((10.0, 10.0), (790.0, 390.0))) == 2
+    occupancy = occupancy.copy()
+    occupancy[47:53, 97:103] = True
+    obstacles.update(occupancy)
+    path = planner.plan((10.0, 10.0), (790.0, 390.0))
+    assert planner.misses == 2
+    assert segments_visible(planner, path)
+
+
+@pytest.mark.parametrize("seed", [7, 1, 2])
+def test_replanning_matches_fresh_search(seed, trials=60, changes=15):
+    # After every map change D* Lite must find a path as short as a fresh A*
+    # search: random cells flip on small random maps while the start follows
+    # the plan
+    rng = np.random.default_rng(seed)
+    for _ in range(trials):
+        occupancy = rng.random((25, 30)) < 0.25
+        obstacles = ObstacleMap(occupancy)
+        planner = GridPlanner(obstacles, smooth=False, cache_size=0)
+        free = np.argwhere(~occupancy)[:, ::-1] + 0.5
+        start, goal = free[rng.choice(len(free), 2)]
+        replanner = planner.replanner(goal)
+        for _ in range(changes):
+            replanned, fresh = replanner.plan(start), planner.plan(start, goal)
+            assert (replanned is None) == (fresh is None)
+            if fresh is not None:
+                lengths = [np.hypot(*np.diff(path, axis=0).T).sum() for path in (replanned, fresh)]
+                assert np.isclose(*lengths), lengths
+                if len(replanned) > 2 and rng.random() < 0.5:
+                    start = replanned[1]
+            rows, cols = rng.integers(0, occupancy.shape, (3, 2)).T
+            occupancy = occupancy.copy()
+            occupancy[rows, cols] = rng.random(3) < 0.5
+            obstacles.update(occupancy)
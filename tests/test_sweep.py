@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from axebot_sim.sweep import grid, random_sample, run_sweep
+
+
+def test_mixed_variant_sets():
+    # The grid varies L only, the sample wheel_angles only; each is tabulated
+    # at the Simulation default where a variant leaves it out
+    variants = grid(L=[50, 85]) + random_sample(2, seed=0, wheel_angles=[(90, -30, -150), (90, -150, -30)])
+    controls = np.tile([1.0, 0.0, 0.2], (20, 1))
+    table = run_sweep(variants, controls, workers=1)
+
+    np.testing.assert_array_equal(table["L"], [50, 85, 85, 85])
+    assert table["wheel_angles"].shape == (4, 3)
+    np.testing.assert_array_equal(table["wheel_angles"][:2], [(90, -30, -150)] * 2)
+    assert len(table["path_length"]) == 4 and (table["path_length"] > 0).all()
+
+
+def test_unknown_parameter_fails_before_running():
+    with pytest.raises(ValueError, match="wheelbase"):
+        run_sweep([{"L": 50}, {"wheelbase": 3}], np.zeros((5, 3)), workers=1)